@@ -0,0 +1,43 @@
+"""
+OpenAPI schema views, only imported when `ENABLE_API_DOCS` is set.
+"""
+
+from drf_yasg import openapi
+from drf_yasg.views import get_schema_view
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+
+class SchemaView(
+    get_schema_view(
+        openapi.Info(
+            title="Hydroponics API",
+            default_version="v1",
+            description="API documentation for the Hydroponics System",
+            license=openapi.License(name="BSD License"),
+        ),
+        public=True,
+        permission_classes=[IsAuthenticated],
+        authentication_classes=[JWTAuthentication],
+    )
+):
+    """
+    Schema view that generates the schema once per process.
+
+    The schema is public, so it does not depend on the user, and it only
+    changes with a deploy. Introspecting every view on each request is wasted
+    work, so each version, base URL and output format is generated once.
+    """
+
+    _schemas = {}
+
+    def get(self, request, version="", format=None):
+        key = (
+            request.version or version or "",
+            request.build_absolute_uri("/"),
+            type(request.accepted_renderer),
+        )
+        if key not in self._schemas:
+            self._schemas[key] = super().get(request, version, format).data
+        return Response(self._schemas[key])
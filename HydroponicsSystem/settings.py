@@ -17,6 +17,15 @@ from pathlib import Path
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+
+def env_bool(name, default=False):
+    """Read a boolean flag from the environment ("1", "true", "yes", "on")."""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
 
@@ -25,14 +34,18 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = os.getenv("DEBUG")
+DEBUG = env_bool("DEBUG")
+
+# Optional surfaces, off in production unless enabled explicitly. Leaving them
+# out also keeps their imports out of every worker's start-up.
+ENABLE_API_DOCS = env_bool("ENABLE_API_DOCS", DEBUG)
+ENABLE_ADMIN = env_bool("ENABLE_ADMIN", DEBUG)
 
 ALLOWED_HOSTS = []
 
 # Application definition
 
 INSTALLED_APPS = [
-    "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
     "django.contrib.sessions",
@@ -40,12 +53,19 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     "rest_framework",
     "rest_framework_simplejwt",
-    "drf_yasg",
     "api",
 ]
 
+if ENABLE_ADMIN:
+    INSTALLED_APPS.insert(0, "django.contrib.admin")
+
+if ENABLE_API_DOCS:
+    INSTALLED_APPS.append("drf_yasg")
+
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    # Compresses responses (Brotli or gzip), so it must see the final body
+    "api.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -85,9 +105,36 @@ DATABASES = {
         "PASSWORD": os.getenv("DB_PASSWORD"),
         "HOST": os.getenv("DB_HOST"),
         "PORT": os.getenv("DB_PORT"),
+        # Keep connections open between requests instead of reconnecting
+        # every time; health checks drop connections the server has closed.
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": env_bool("DB_CONN_HEALTH_CHECKS", True),
     }
 }
 
+# Optional read replicas ("host" or "host:port", comma separated). Heavy list
+# reads are routed to them by `api.db_routers.ReplicaRouter`; in tests every
+# replica mirrors the default database.
+DATABASE_REPLICAS = []
+for index, replica in enumerate(
+    filter(None, os.getenv("DB_REPLICA_HOSTS", "").split(","))
+):
+    host, _, port = replica.strip().partition(":")
+    alias = f"replica_{index}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+# Seconds a client keeps reading from the primary after a write.
+DATABASE_REPLICA_STICKY_SECONDS = int(os.getenv("DB_REPLICA_STICKY_SECONDS", "5"))
+
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ["api.db_routers.ReplicaRouter"]
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -129,6 +176,61 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
+
+# Cold measurement history is moved into columnar files kept in the
+# "measurement_archive" storage. Any Django storage backend works; local
+# filesystem storage lets reads memory-map the files directly.
+MEASUREMENT_ARCHIVE_ROOT = os.getenv(
+    "MEASUREMENT_ARCHIVE_ROOT", os.path.join(BASE_DIR, "archive")
+)
+
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+    "measurement_archive": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {"location": MEASUREMENT_ARCHIVE_ROOT},
+    },
+}
+
+# Cache for analytics results and the replica read-your-writes window. The
+# default in-process cache is not shared between gunicorn workers and the job
+# worker, so production should use a shared backend, e.g.
+# CACHE_BACKEND=django.core.cache.backends.db.DatabaseCache with
+# CACHE_LOCATION=cache_table (after `manage.py createcachetable`).
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
+# Most measurements returned by one page of the history endpoint.
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "10000"))
+
+# Seconds per-system analytics stay cached (entries are also keyed by the
+# latest measurement and a per-system version bumped on edits and deletes,
+# so changes invalidate them immediately).
+ANALYTICS_CACHE_TIMEOUT = int(os.getenv("ANALYTICS_CACHE_TIMEOUT", "3600"))
+
+# Days finished (done or failed) background jobs are kept before the worker
+# deletes them.
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))
+
+# Acceptable (low, high) range of each metric; readings outside it are
+# counted as out of band.
+MEASUREMENT_BANDS = {
+    "ph": (5.5, 6.5),
+    "temperature": (18.0, 26.0),
+    "tds": (500.0, 1500.0),
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -0,0 +1,12 @@
+"""
+Settings for running the test suite.
+
+Adds a `replica` database alias mirroring the default test database, so
+replica routing is tested against a real second connection. The alias is
+not listed in DATABASE_REPLICAS; the replica tests opt in to it.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES
+
+DATABASES["replica"] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
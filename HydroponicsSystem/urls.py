@@ -2,43 +2,36 @@
 URL configuration for HydroponicsSystem project.
 """
 
-from django.contrib import admin
 from django.urls import path, include
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
 from api.views import RegisterView
 from django.conf import settings
 
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Hydroponics API",
-        default_version="v1",
-        description="API documentation for the Hydroponics System",
-        license=openapi.License(name="BSD License"),
-    ),
-    public=True,
-    permission_classes=[IsAuthenticated],
-    authentication_classes=[JWTAuthentication],
-)
 urlpatterns = [
-    path("admin/", admin.site.urls),
     path("api/", include("api.urls")),
     path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
-    path(
-        "api/docs/",
-        schema_view.with_ui("swagger", cache_timeout=0),
-        name="schema-swagger-ui",
-    ),
-    path(
-        "api/redoc/", schema_view.with_ui("redoc", cache_timeout=0), name="schema-redoc"
-    ),
     path("api/register/", RegisterView.as_view(), name="register"),
 ]
 
+# Admin and API docs are optional, so production workers do not import them
+if settings.ENABLE_ADMIN:
+    from django.contrib import admin
+
+    urlpatterns += [path("admin/", admin.site.urls)]
+
+if settings.ENABLE_API_DOCS:
+    from .schema import SchemaView
+
+    urlpatterns += [
+        path(
+            "api/docs/",
+            SchemaView.with_ui("swagger"),
+            name="schema-swagger-ui",
+        ),
+        path("api/redoc/", SchemaView.with_ui("redoc"), name="schema-redoc"),
+    ]
+
 if settings.DEBUG:
     import debug_toolbar
 
@@ -8,9 +8,16 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/wsgi/
 """
 
 import os
+from importlib import import_module
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "HydroponicsSystem.settings")
 
 application = get_wsgi_application()
+
+# Import the URLconf, and with it every view, now instead of on the first
+# request. With gunicorn's `preload_app` this happens once in the master and
+# forked workers start with everything imported.
+import_module(settings.ROOT_URLCONF)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import HydroponicSystem, SensorMeasurement
+from .models import HydroponicSystem, Job, MeasurementArchive, SensorMeasurement
 
 
 @admin.register(HydroponicSystem)
@@ -14,3 +14,17 @@ class SensorMeasurementAdmin(admin.ModelAdmin):
     list_display = ("system", "ph", "temperature", "tds", "measured_at")
     search_fields = ("system__name",)
     list_filter = ("measured_at", "ph", "temperature", "tds")
+
+
+@admin.register(MeasurementArchive)
+class MeasurementArchiveAdmin(admin.ModelAdmin):
+    list_display = ("system", "start", "end", "row_count", "created_at")
+    search_fields = ("system__name",)
+    list_filter = ("created_at",)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("name", "status", "created_at", "updated_at")
+    search_fields = ("name",)
+    list_filter = ("status", "name")
@@ -0,0 +1,92 @@
+"""
+Vectorized per-system analytics over the measurement history.
+
+The series is loaded in column form (see `api.archive.read_history`) and all
+statistics are computed with NumPy, never by iterating over model instances.
+"""
+
+import math
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from .archive import read_history
+from .models import HydroponicSystem
+
+US_PER_HOUR = 3_600_000_000
+US_PER_DAY = 24 * US_PER_HOUR
+
+
+def _finite(value):
+    """Return the value as a float, or None if it is NaN or infinite."""
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def compute_analytics(series):
+    """
+    Compute agronomic statistics for a measurement `Series`.
+
+    - `ph_temperature_correlation`: Pearson correlation of pH and temperature
+    - `tds_drift_per_day`: slope of a linear fit of TDS over time, per day
+    - `diurnal_temperature`: mean temperature for each UTC hour of the day
+    """
+    count = len(series.measured_at)
+    result = {
+        "count": count,
+        "ph_temperature_correlation": None,
+        "tds_drift_per_day": None,
+        "diurnal_temperature": [None] * 24,
+    }
+    if not count:
+        return result
+
+    if count >= 2 and series.ph.std() > 0 and series.temperature.std() > 0:
+        result["ph_temperature_correlation"] = _finite(
+            np.corrcoef(series.ph, series.temperature)[0, 1]
+        )
+
+    days = (series.measured_at - series.measured_at[0]) / US_PER_DAY
+    if count >= 2 and days[-1] > 0:
+        result["tds_drift_per_day"] = _finite(np.polyfit(days, series.tds, 1)[0])
+
+    hours = (series.measured_at // US_PER_HOUR) % 24
+    totals = np.bincount(hours, weights=series.temperature, minlength=24)
+    counts = np.bincount(hours, minlength=24)
+    result["diurnal_temperature"] = [
+        _finite(total / n) if n else None for total, n in zip(totals, counts)
+    ]
+    return result
+
+
+def invalidate_system_analytics(system_id):
+    """Drop the system's cached analytics after a reading was changed or deleted."""
+    HydroponicSystem.all_objects.filter(pk=system_id).update(
+        analytics_version=F("analytics_version") + 1
+    )
+
+
+def system_analytics(system, start=None, end=None):
+    """
+    Return cached analytics for the system's measurements in `[start, end)`.
+
+    The cache key includes the id of the system's latest measurement, so a new
+    reading invalidates the entry while repeated dashboard loads are free.
+    Edits and deletions bump the system's `analytics_version`, which is part
+    of the key too; it is stored in the database, so every process sees it.
+    """
+    last_id = system.measurements.order_by("-id").values_list("id", flat=True).first()
+    key = "analytics:{}:{}:{}:{}:{}".format(
+        system.pk,
+        start.isoformat() if start else "",
+        end.isoformat() if end else "",
+        last_id,
+        system.analytics_version,
+    )
+    result = cache.get(key)
+    if result is None:
+        result = compute_analytics(read_history(system, start, end))
+        cache.set(key, result, settings.ANALYTICS_CACHE_TIMEOUT)
+    return result
@@ -0,0 +1,229 @@
+"""
+Columnar archive files for cold measurement history.
+
+Closed time ranges of a system's measurements are moved out of the database
+into one file per range. Files are little-endian and laid out so every column
+can be memory-mapped and sliced without parsing:
+
+    header        magic b"HCA1", uint32 (reserved), uint64 row count   16 bytes
+    measured_at   int64 microseconds since the epoch, ascending    8 * rows
+    ph            float32                                          4 * rows
+    temperature   float32                                          4 * rows
+    tds           float32                                          4 * rows
+"""
+
+import mmap
+import struct
+import sys
+from array import array
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.db import transaction
+
+from .models import MeasurementArchive, SensorMeasurement
+
+MAGIC = b"HCA1"
+HEADER = struct.Struct("<4sIQ")
+METRICS = ("ph", "temperature", "tds")
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# Archived values are stored as float32, which keeps 6 significant decimal
+# digits exactly (FLT_DIG). Rounding to that many digits on read turns e.g.
+# 6.0999999 back into 6.1 and 1234.5699 into 1234.57; sensor resolution is
+# far coarser.
+ARCHIVE_DIGITS = 6
+DELETE_BATCH_SIZE = 10000
+
+Series = namedtuple("Series", ["measured_at", *METRICS])
+LIVE_ROW = np.dtype([("measured_at", np.int64), *((m, np.float64) for m in METRICS)])
+
+
+def archive_storage():
+    return storages["measurement_archive"]
+
+
+def to_epoch_us(value):
+    """Convert an aware datetime to integer microseconds since the epoch."""
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def from_epoch_us(value):
+    """Convert integer microseconds since the epoch to an aware datetime."""
+    return EPOCH + timedelta(microseconds=value)
+
+
+def encode(series):
+    """Serialize a `Series` of `array("q")` / `array("f")` columns to bytes."""
+    columns = [array("q", series.measured_at)]
+    columns += [array("f", getattr(series, metric)) for metric in METRICS]
+    if sys.byteorder == "big":
+        for column in columns:
+            column.byteswap()
+    header = HEADER.pack(MAGIC, 0, len(columns[0]))
+    return header + b"".join(column.tobytes() for column in columns)
+
+
+def decode(buffer):
+    """Return a `Series` of zero-copy memoryviews over an encoded buffer."""
+    view = memoryview(buffer)
+    magic, _, rows = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError("Not a measurement archive file.")
+    offset = HEADER.size
+    columns = []
+    for typecode in ("q", "f", "f", "f"):
+        size = array(typecode).itemsize * rows
+        columns.append(view[offset:][:size].cast(typecode))
+        offset += size
+    if sys.byteorder == "big":
+        columns = [array(column.format, column) for column in columns]
+        for column in columns:
+            column.byteswap()
+    return Series(*columns)
+
+
+def round_float32(values):
+    """Widen float32 values to float64, rounded to `ARCHIVE_DIGITS` significant digits."""
+    values = values.astype(np.float64)
+    magnitude = np.abs(values, out=np.ones_like(values), where=values != 0)
+    scale = 10.0 ** (ARCHIVE_DIGITS - 1 - np.floor(np.log10(magnitude)))
+    return np.round(values * scale) / scale
+
+
+def open_archive(name):
+    """
+    Open an archive file from the archive storage.
+
+    Local files are memory-mapped, so only the pages of the requested range
+    are read from disk. Remote storages (object stores) are read into memory.
+    """
+    storage = archive_storage()
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        with storage.open(name, "rb") as handle:
+            return decode(handle.read())
+    with open(path, "rb") as handle:
+        return decode(mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def archive_system(system, cutoff):
+    """
+    Move all of the system's measurements taken before `cutoff` into a file.
+
+    Returns the new `MeasurementArchive`, or None if there was nothing to archive.
+    The rows are locked while they are read, and the file is written before
+    the transaction that records the archive and deletes the rows commits, so
+    edits and deletions made meanwhile are neither lost nor resurrected.
+    """
+    storage = archive_storage()
+    name = None
+    try:
+        with transaction.atomic():
+            queryset = (
+                system.measurements.filter(measured_at__lt=cutoff)
+                .select_for_update()
+                .order_by("measured_at", "id")
+                .values_list("id", "measured_at", *METRICS)
+            )
+            ids = array("q")
+            series = Series(array("q"), array("f"), array("f"), array("f"))
+            for pk, measured_at, *values in queryset.iterator(chunk_size=5000):
+                ids.append(pk)
+                series.measured_at.append(to_epoch_us(measured_at))
+                for column, value in zip(series[1:], values):
+                    column.append(value)
+
+            if not ids:
+                return None
+
+            start = from_epoch_us(series.measured_at[0])
+            name = storage.save(
+                f"{system.pk}/{start:%Y%m%dT%H%M%S}-{cutoff:%Y%m%dT%H%M%S}.hca",
+                ContentFile(encode(series)),
+            )
+            archive = MeasurementArchive.objects.create(
+                system=system, start=start, end=cutoff, row_count=len(ids), file=name
+            )
+            for offset in range(0, len(ids), DELETE_BATCH_SIZE):
+                batch = ids[offset:][:DELETE_BATCH_SIZE].tolist()
+                SensorMeasurement.objects.filter(id__in=batch).delete()
+    except Exception:
+        if name:
+            storage.delete(name)
+        raise
+    return archive
+
+
+def _read_archive(archive, start, end, limit):
+    columns = open_archive(archive.file)
+    timestamps = np.frombuffer(columns.measured_at, dtype=np.int64)
+    lo = np.searchsorted(timestamps, to_epoch_us(start)) if start else 0
+    hi = np.searchsorted(timestamps, to_epoch_us(end)) if end else len(timestamps)
+    if limit is not None:
+        hi = min(hi, lo + limit)
+    return Series(
+        timestamps[lo:hi],
+        *(
+            round_float32(np.frombuffer(column, dtype=np.float32)[lo:hi])
+            for column in columns[1:]
+        ),
+    )
+
+
+def _read_live(system, start, end, limit):
+    live = system.measurements.order_by("measured_at", "id")
+    if start:
+        live = live.filter(measured_at__gte=start)
+    if end:
+        live = live.filter(measured_at__lt=end)
+    if limit is not None:
+        live = live[:limit]
+    # Streamed straight into a structured array, without a list of row tuples
+    rows = np.fromiter(
+        (
+            (to_epoch_us(measured_at), *values)
+            for measured_at, *values in live.values_list(
+                "measured_at", *METRICS
+            ).iterator(chunk_size=5000)
+        ),
+        dtype=LIVE_ROW,
+    )
+    return Series(*(rows[name] for name in LIVE_ROW.names))
+
+
+def read_history(system, start=None, end=None, limit=None):
+    """
+    Return the system's measurements in `[start, end)` as a `Series` of arrays.
+
+    Archived ranges and live rows are merged transparently. Timestamps are
+    epoch microseconds (int64), metrics are float64 NumPy arrays. With
+    `limit`, only the earliest `limit` measurements are read.
+    """
+    archives = system.archives.order_by("start")
+    if start:
+        archives = archives.filter(end__gt=start)
+    if end:
+        archives = archives.filter(start__lt=end)
+
+    # An archive committed between the two reads would hide its rows from
+    # both, so read again until the list of archives did not change.
+    while True:
+        found = list(archives.all())
+        parts = [_read_archive(archive, start, end, limit) for archive in found]
+        parts.append(_read_live(system, start, end, limit))
+        if list(archives.values_list("id", flat=True)) == [a.id for a in found]:
+            break
+
+    series = Series(*(np.concatenate(columns) for columns in zip(*parts)))
+    # Late readings archived after an older range can interleave; re-sort then.
+    if np.any(np.diff(series.measured_at) < 0):
+        order = np.argsort(series.measured_at, kind="stable")
+        series = Series(*(column[order] for column in series))
+    if limit is not None:
+        series = Series(*(column[:limit] for column in series))
+    return series
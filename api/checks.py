@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core import checks
+
+# Cache backends whose entries are only visible to the process that wrote them.
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@checks.register(checks.Tags.database, checks.Tags.caches)
+def check_replica_cache(app_configs, **kwargs):
+    """
+    Read replicas need a cache shared by all workers.
+
+    The read-your-writes window is stored in the default cache; with a
+    per-process cache a read served by another worker would go to a lagging
+    replica right after the client's write.
+    """
+    if not getattr(settings, "DATABASE_REPLICAS", []):
+        return []
+    if settings.CACHES["default"]["BACKEND"] in PROCESS_LOCAL_CACHES:
+        return [
+            checks.Error(
+                "DATABASE_REPLICAS requires a cache shared between processes.",
+                hint=(
+                    "Set CACHE_BACKEND (and CACHE_LOCATION) to a shared cache, "
+                    "e.g. django.core.cache.backends.db.DatabaseCache."
+                ),
+                id="api.E001",
+            )
+        ]
+    return []
@@ -0,0 +1,74 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+_replica_reads = ContextVar("replica_reads", default=False)
+
+STICKY_CACHE_KEY = "db-primary-sticky:{user_id}"
+
+
+def start_replica_reads():
+    """Route reads to a read replica until `stop_replica_reads(token)`."""
+    return _replica_reads.set(True)
+
+
+def stop_replica_reads(token):
+    """Undo the matching `start_replica_reads()` call."""
+    _replica_reads.reset(token)
+
+
+@contextmanager
+def use_replica():
+    """Route reads made inside the block to a read replica, if configured."""
+    token = start_replica_reads()
+    try:
+        yield
+    finally:
+        stop_replica_reads(token)
+
+
+def mark_recent_write(user):
+    """
+    Pin the user's reads to the primary for `DATABASE_REPLICA_STICKY_SECONDS`.
+
+    Replicas lag behind the primary, so a client that has just written data
+    must read it back from the primary to see its own changes.
+    """
+    seconds = getattr(settings, "DATABASE_REPLICA_STICKY_SECONDS", 0)
+    if seconds and user.is_authenticated:
+        cache.set(STICKY_CACHE_KEY.format(user_id=user.pk), True, seconds)
+
+
+def has_recent_write(user):
+    """Return True if the user wrote within the stickiness window."""
+    if not user.is_authenticated:
+        return False
+    return cache.get(STICKY_CACHE_KEY.format(user_id=user.pk), False)
+
+
+class ReplicaRouter:
+    """
+    Database router sending opted-in reads to the configured read replicas.
+
+    - Reads are only routed to a replica inside `use_replica()`
+    - Writes and migrations always go to the `default` database
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, "DATABASE_REPLICAS", [])
+        if replicas and _replica_reads.get():
+            return random.choice(replicas)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Replicas mirror the primary, so objects from any of them may relate."""
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
@@ -0,0 +1,37 @@
+import django_filters
+from django.db.models import Q
+
+from .archive import METRICS
+from .models import SensorMeasurement, out_of_band_q
+
+
+class SensorMeasurementFilter(django_filters.FilterSet):
+    """
+    Filters for sensor measurements.
+
+    - Exact match and ranges on pH, temperature and TDS (`ph__gte`, `tds__lte`, ...)
+    - Time ranges on the measurement date (`measured_at__gte`, `measured_at__lt`)
+    - `out_of_band` selects readings outside `MEASUREMENT_BANDS` for one
+      metric, or for any metric with `out_of_band=any`
+    """
+
+    out_of_band = django_filters.ChoiceFilter(
+        choices=[(metric, metric) for metric in METRICS] + [("any", "any")],
+        method="filter_out_of_band",
+    )
+
+    class Meta:
+        model = SensorMeasurement
+        fields = {
+            "ph": ["exact", "gte", "lte"],
+            "temperature": ["exact", "gte", "lte"],
+            "tds": ["exact", "gte", "lte"],
+            "measured_at": ["exact", "gte", "lt"],
+        }
+
+    def filter_out_of_band(self, queryset, name, value):
+        metrics = METRICS if value == "any" else [value]
+        condition = Q()
+        for metric in metrics:
+            condition |= out_of_band_q(metric)
+        return queryset.filter(condition)
@@ -0,0 +1,91 @@
+"""
+Fleet overview: latest reading and 24h statistics for many systems at once.
+
+Everything is computed in a constant number of grouped queries, however many
+systems are summarised.
+"""
+
+from datetime import timedelta
+
+from django.db.models import Avg, Count, Max, Min, OuterRef, Subquery
+from django.utils import timezone
+
+from .archive import METRICS
+from .models import HydroponicSystem, SensorMeasurement, out_of_band_q
+
+
+def latest_measurements(system_ids):
+    """Return {system_id: latest measurement} using a single query."""
+    latest_ids = HydroponicSystem.objects.filter(id__in=system_ids).annotate(
+        latest_id=Subquery(
+            SensorMeasurement.objects.filter(system=OuterRef("pk"))
+            .order_by("-measured_at", "-id")
+            .values("id")[:1]
+        )
+    )
+    measurements = SensorMeasurement.objects.filter(
+        id__in=latest_ids.values("latest_id")
+    )
+    return {measurement.system_id: measurement for measurement in measurements}
+
+
+def window_statistics(system_ids, since):
+    """Return {system_id: statistics} for measurements taken after `since`."""
+    aggregates = {"count": Count("id")}
+    for metric in METRICS:
+        aggregates[f"{metric}_min"] = Min(metric)
+        aggregates[f"{metric}_max"] = Max(metric)
+        aggregates[f"{metric}_mean"] = Avg(metric)
+        aggregates[f"{metric}_out_of_band"] = Count("id", filter=out_of_band_q(metric))
+
+    rows = (
+        SensorMeasurement.objects.filter(
+            system_id__in=system_ids, measured_at__gte=since
+        )
+        .values("system_id")
+        .annotate(**aggregates)
+        .order_by()
+    )
+    return {row["system_id"]: row for row in rows}
+
+
+def fleet_summary(systems):
+    """
+    Summarise the given systems: latest reading plus min/max/mean and
+    out-of-band counts per metric over the last 24 hours.
+    """
+    system_ids = [system.id for system in systems]
+    latest = latest_measurements(system_ids)
+    statistics = window_statistics(system_ids, timezone.now() - timedelta(hours=24))
+
+    summary = []
+    for system in systems:
+        measurement = latest.get(system.id)
+        row = statistics.get(system.id, {})
+        summary.append(
+            {
+                "id": system.id,
+                "name": system.name,
+                "latest": (
+                    {
+                        "measured_at": measurement.measured_at,
+                        **{metric: getattr(measurement, metric) for metric in METRICS},
+                    }
+                    if measurement
+                    else None
+                ),
+                "last_24h": {
+                    "count": row.get("count", 0),
+                    **{
+                        metric: {
+                            "min": row.get(f"{metric}_min"),
+                            "max": row.get(f"{metric}_max"),
+                            "mean": row.get(f"{metric}_mean"),
+                            "out_of_band": row.get(f"{metric}_out_of_band", 0),
+                        }
+                        for metric in METRICS
+                    },
+                },
+            }
+        )
+    return summary
@@ -0,0 +1,321 @@
+"""
+Line-protocol ingest gateway for sensor readings.
+
+Sensors send readings over TCP or UDP in (a subset of) InfluxDB line protocol,
+one reading per line, with an optional nanosecond epoch timestamp:
+
+    hydroponics,system=<id> ph=6.1,temperature=22.4,tds=810 1739000000000000000
+
+A TCP connection starts with `AUTH <JWT access token>`, and so does every UDP
+datagram. Readings are queued, micro-batched by size and time, and written
+through `SensorMeasurement.objects.bulk_ingest`, the same validation and
+bulk-insert path used elsewhere. A bounded queue provides back-pressure:
+TCP readers stop reading while it is full, UDP datagrams are dropped.
+"""
+
+import asyncio
+import time
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.db import DatabaseError, close_old_connections, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .archive import METRICS, from_epoch_us
+from .models import HydroponicSystem, SensorMeasurement
+from .tasks import measurements_added
+
+# How long credentials are trusted before the token is checked again (never
+# past its expiry). Applies to open TCP connections and to UDP senders.
+AUTH_TTL = 60
+
+
+class LineProtocolError(ValueError):
+    pass
+
+
+def parse_line(line):
+    """Parse one line-protocol reading into an unsaved `SensorMeasurement`."""
+    parts = line.split()
+    if len(parts) not in (2, 3):
+        raise LineProtocolError("Expected '<measurement>,<tags> <fields> [timestamp]'.")
+    try:
+        tags = dict(tag.split("=", 1) for tag in parts[0].split(",")[1:])
+        fields = dict(field.split("=", 1) for field in parts[1].split(","))
+        values = {metric: float(fields[metric].rstrip("i")) for metric in METRICS}
+        system_id = int(tags["system"])
+        measured_at = (
+            from_epoch_us(int(parts[2]) // 1000) if len(parts) == 3 else timezone.now()
+        )
+    except KeyError as e:
+        raise LineProtocolError(f"Missing {e.args[0]}.")
+    except (ValueError, OverflowError) as e:
+        raise LineProtocolError(f"Invalid value: {e}")
+    return SensorMeasurement(system_id=system_id, measured_at=measured_at, **values)
+
+
+def authenticate(token):
+    """
+    Return the ids of the systems the token's user may write to.
+
+    Also returns the token's expiry (epoch seconds), so open connections can
+    check it again in time.
+    """
+    try:
+        access_token = AccessToken(token)
+        user_id, expires = access_token[api_settings.USER_ID_CLAIM], access_token["exp"]
+    except (TokenError, KeyError):
+        raise PermissionError("Invalid or expired token.")
+    if not User.objects.filter(id=user_id, is_active=True).exists():
+        raise PermissionError("Inactive or unknown user.")
+    system_ids = set(
+        HydroponicSystem.objects.filter(owner_id=user_id).values_list("id", flat=True)
+    )
+    return system_ids, expires
+
+
+def write_batch(measurements):
+    """Validate and insert a batch; return `(created, rejected)` counts."""
+    close_old_connections()
+    # Systems deleted since the client authenticated must not fail the batch
+    live = set(
+        HydroponicSystem.objects.filter(
+            id__in={measurement.system_id for measurement in measurements}
+        ).values_list("id", flat=True)
+    )
+    with transaction.atomic():
+        created, _ = SensorMeasurement.objects.bulk_ingest(
+            [
+                measurement
+                for measurement in measurements
+                if measurement.system_id in live
+            ]
+        )
+        measurements_added(measurement.system_id for measurement in created)
+    return len(created), len(measurements) - len(created)
+
+
+def write_rows(measurements):
+    """
+    Write a batch that failed as a whole one row at a time.
+
+    Returns `(created, rejected, failed)` counts, so a single row the database
+    refuses does not lose the rest of the batch.
+    """
+    created = rejected = failed = 0
+    for measurement in measurements:
+        try:
+            row_created, row_rejected = write_batch([measurement])
+        except DatabaseError:
+            failed += 1
+        else:
+            created += row_created
+            rejected += row_rejected
+    return created, rejected, failed
+
+
+class IngestGateway:
+    """Accepts readings over TCP/UDP and writes them in micro-batches."""
+
+    def __init__(self, batch_size=500, flush_interval=0.5, max_pending=10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.stats = Counter()
+        self.servers = []
+        self.transports = []
+        self.writer_task = None
+        self.udp_auth = {}
+
+    async def start(self, host, tcp_port=None, udp_port=None):
+        """Start listening; a port of None disables that transport."""
+        loop = asyncio.get_running_loop()
+        self.writer_task = asyncio.create_task(self.write_loop())
+        if tcp_port is not None:
+            server = await asyncio.start_server(self.handle_tcp, host, tcp_port)
+            self.servers.append(server)
+        if udp_port is not None:
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: _DatagramProtocol(self), local_addr=(host, udp_port)
+            )
+            self.transports.append(transport)
+
+    async def stop(self):
+        """Stop accepting readings and write everything still queued."""
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        for transport in self.transports:
+            transport.close()
+        if self.writer_task:
+            await self.queue.put(None)  # Tells the writer to flush and exit
+            await self.writer_task
+
+    def accept(self, line, system_ids):
+        """Parse a line and check that it targets one of `system_ids`."""
+        measurement = parse_line(line)
+        if measurement.system_id not in system_ids:
+            raise LineProtocolError(f"Unknown system {measurement.system_id}.")
+        self.stats["received"] += 1
+        return measurement
+
+    async def authenticate(self, token):
+        """Return the token's system ids and the monotonic time to check it again."""
+        system_ids, expires = await sync_to_async(authenticate)(token)
+        return system_ids, time.monotonic() + min(AUTH_TTL, expires - time.time())
+
+    async def reject(self, writer, error):
+        self.stats["rejected"] += 1
+        writer.write(f"ERR {error}\n".encode())
+        await writer.drain()  # Slows down clients flooding invalid lines
+
+    async def handle_tcp(self, reader, writer):
+        """
+        Authenticate a connection, then queue its readings.
+
+        The token is checked again every `AUTH_TTL` seconds and at its expiry;
+        once it is expired or the user deactivated the connection is closed.
+        """
+        try:
+            auth = (await reader.readline()).decode().split()
+            try:
+                if len(auth) != 2 or auth[0] != "AUTH":
+                    raise PermissionError("Expected 'AUTH <token>'.")
+                system_ids, check_at = await self.authenticate(auth[1])
+            except PermissionError as e:
+                writer.write(f"ERR {e}\n".encode())
+                await writer.drain()
+                return
+            writer.write(b"OK\n")
+
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:  # Longer than the stream limit (64 KiB)
+                    await self.reject(writer, "Line too long.")
+                    continue
+                if not line:
+                    break
+                line = line.decode().strip()
+                if not line:
+                    continue
+                if time.monotonic() >= check_at:
+                    try:
+                        system_ids, check_at = await self.authenticate(auth[1])
+                    except PermissionError as e:
+                        await self.reject(writer, e)
+                        return
+                try:
+                    measurement = self.accept(line, system_ids)
+                except LineProtocolError as e:
+                    await self.reject(writer, e)
+                    continue
+                # Waits while the queue is full, which stops reading the socket
+                await self.queue.put(measurement)
+        except (ConnectionError, UnicodeDecodeError, ValueError):
+            self.stats["rejected"] += 1
+        finally:
+            writer.close()
+
+    async def handle_datagram(self, data):
+        try:
+            auth, *lines = data.decode().splitlines()
+            token = auth.split()[1] if auth.startswith("AUTH ") else None
+        except (UnicodeDecodeError, ValueError, IndexError):
+            token = None
+        if not token:
+            self.stats["rejected"] += 1
+            return
+
+        cached = self.udp_auth.get(token)
+        if cached and cached[1] > time.monotonic():
+            system_ids = cached[0]
+        else:
+            try:
+                system_ids, check_at = await self.authenticate(token)
+            except PermissionError:
+                self.udp_auth.pop(token, None)
+                self.stats["rejected"] += len(lines)
+                return
+            if len(self.udp_auth) > 1000:  # Forget tokens of silent devices
+                now = time.monotonic()
+                self.udp_auth = {
+                    key: value for key, value in self.udp_auth.items() if value[1] > now
+                }
+            self.udp_auth[token] = (system_ids, check_at)
+
+        for line in filter(None, (line.strip() for line in lines)):
+            try:
+                self.queue.put_nowait(self.accept(line, system_ids))
+            except LineProtocolError:
+                self.stats["rejected"] += 1
+            except asyncio.QueueFull:
+                self.stats["dropped"] += 1
+
+    async def write_loop(self):
+        """Collect readings into batches of `batch_size` or `flush_interval`."""
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            measurement = await self.queue.get()
+            if measurement is None:
+                return
+            batch = [measurement]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    measurement = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if measurement is None:
+                    stopping = True
+                    break
+                batch.append(measurement)
+            await self.flush(batch)
+
+    async def flush(self, batch):
+        try:
+            created, rejected = await sync_to_async(write_batch)(batch)
+        except DatabaseError:
+            created, rejected, failed = await sync_to_async(write_rows)(batch)
+            self.stats["failed"] += failed
+        self.stats["written"] += created
+        self.stats["rejected"] += rejected
+        self.stats["batches"] += 1
+
+    async def report_loop(self, interval, write):
+        """Call `write` with throughput figures every `interval` seconds."""
+        previous = Counter()
+        while True:
+            await asyncio.sleep(interval)
+            current = self.stats.copy()
+            write(
+                "received {:.0f}/s, written {:.0f}/s, rejected {}, dropped {}, "
+                "failed {}, pending {}".format(
+                    (current["received"] - previous["received"]) / interval,
+                    (current["written"] - previous["written"]) / interval,
+                    current["rejected"],
+                    current["dropped"],
+                    current["failed"],
+                    self.queue.qsize(),
+                )
+            )
+            previous = current
+
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, gateway):
+        self.gateway = gateway
+        self.tasks = set()
+
+    def datagram_received(self, data, addr):
+        task = asyncio.ensure_future(self.gateway.handle_datagram(data))
+        self.tasks.add(task)  # Keep a reference until the task is done
+        task.add_done_callback(self.tasks.discard)
@@ -0,0 +1,201 @@
+"""
+Database-backed background jobs.
+
+Handlers are registered with the `job` decorator and queued with `enqueue`.
+The `run_jobs` management command claims pending jobs in batches and runs
+them. On PostgreSQL claims use `SELECT ... FOR UPDATE SKIP LOCKED`, so
+concurrent workers never wait for each other; on SQLite (tests, development)
+the conditional claim update alone keeps two workers from taking one job.
+
+A claimed job stays locked while its worker keeps renewing `locked_at`:
+before the job starts and whenever a long handler calls `heartbeat`. Every
+update of a claimed job is conditional on the lock, so a worker that lost it
+can never overwrite the outcome recorded by the worker that took over.
+"""
+
+import os
+import socket
+import threading
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+# Seconds before the first retry; doubled after every further failure.
+RETRY_DELAY = 10
+# Running jobs not renewed for longer than this belong to a dead worker.
+LOCK_TIMEOUT = timedelta(minutes=30)
+
+_handlers = {}
+_running = threading.local()
+
+
+class LockLost(Exception):
+    """The running job was reclaimed by another worker."""
+
+
+def job(name):
+    """Register the decorated function as the handler of jobs called `name`."""
+
+    def register(func):
+        _handlers[name] = func
+        return func
+
+    return register
+
+
+def enqueue(name, *, dedupe_key="", delay=0, **payload):
+    """
+    Queue a job; the handler is called with `payload` as keyword arguments.
+
+    - `dedupe_key`: reuse a pending job with the same name and key instead of
+      queueing another one, so bursts of events cause a single run
+    - `delay`: seconds to wait before the job may run
+    """
+    if name not in _handlers:
+        raise ValueError(f"Unknown job: {name}")
+    if dedupe_key:
+        pending = Job.objects.filter(
+            name=name, dedupe_key=dedupe_key, status=Job.PENDING
+        ).first()
+        if pending:
+            return pending
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        dedupe_key=dedupe_key,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def new_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def claim(worker_id, limit=1):
+    """
+    Lock up to `limit` runnable jobs for `worker_id` and return them.
+
+    Runnable jobs are pending jobs that are due, and running jobs whose worker
+    stopped renewing them for `LOCK_TIMEOUT` (it crashed or was killed). Such
+    jobs are only taken over while attempts are left, otherwise they fail.
+    """
+    now = timezone.now()
+    stale = Q(status=Job.RUNNING, locked_at__lt=now - LOCK_TIMEOUT)
+    Job.objects.filter(stale, attempts__gte=F("max_attempts")).update(
+        status=Job.FAILED,
+        locked_by="",
+        last_error="The worker stopped renewing the job's lock.",
+        updated_at=now,
+    )
+    runnable = Q(status=Job.PENDING, run_after__lte=now) | (
+        stale & Q(attempts__lt=F("max_attempts"))
+    )
+    with transaction.atomic():
+        ids = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(runnable)
+            .order_by("run_after", "id")
+            .values_list("id", flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        Job.objects.filter(runnable, id__in=ids).update(
+            status=Job.RUNNING,
+            locked_by=worker_id,
+            locked_at=now,
+            attempts=F("attempts") + 1,
+        )
+    return list(Job.objects.filter(id__in=ids, locked_by=worker_id, locked_at=now))
+
+
+def _owned(job):
+    return Job.objects.filter(id=job.id, status=Job.RUNNING, locked_by=job.locked_by)
+
+
+def heartbeat():
+    """
+    Renew the lock of the job running in this thread.
+
+    Handlers that may run for long call this between steps. Raises `LockLost`
+    if the job was taken over in the meantime, so it never runs twice at once.
+    """
+    job = getattr(_running, "job", None)
+    if job is None:
+        return
+    job.locked_at = timezone.now()
+    if not _owned(job).update(locked_at=job.locked_at):
+        raise LockLost(f"Job {job.id} was reclaimed by another worker.")
+
+
+def run_job(job):
+    """
+    Run a claimed job and record the outcome.
+
+    Failed jobs are retried with exponential backoff until `max_attempts` is
+    reached. Handlers control their own transactions, so long jobs can commit
+    in batches. Jobs whose lock was lost are left to the worker holding it.
+    """
+    _running.job = job
+    try:
+        heartbeat()  # Claimed jobs may have waited for the rest of the batch
+        _handlers[job.name](**job.payload)
+    except LockLost:
+        job.refresh_from_db()
+        return job
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.PENDING
+            job.run_after = timezone.now() + timedelta(
+                seconds=RETRY_DELAY * 2 ** (job.attempts - 1)
+            )
+        else:
+            job.status = Job.FAILED
+    else:
+        job.status = Job.DONE
+    finally:
+        _running.job = None
+
+    recorded = _owned(job).update(
+        status=job.status,
+        last_error=job.last_error,
+        run_after=job.run_after,
+        locked_by="",
+        updated_at=timezone.now(),
+    )
+    if recorded:
+        job.locked_by = ""
+    else:
+        job.refresh_from_db()
+    return job
+
+
+def prune(batch_size=1000):
+    """
+    Delete jobs that finished more than `JOB_RETENTION_DAYS` ago.
+
+    Jobs are deleted in short batches so the queue is never locked for long.
+    Returns the number of deleted jobs.
+    """
+    cutoff = timezone.now() - timedelta(days=settings.JOB_RETENTION_DAYS)
+    finished = Job.objects.filter(
+        status__in=[Job.DONE, Job.FAILED], updated_at__lt=cutoff
+    )
+    deleted = 0
+    while True:
+        batch = list(finished.values_list("id", flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        deleted += Job.objects.filter(id__in=batch).delete()[0]
+
+
+def run_batch(worker_id, batch_size=1):
+    """Claim and run up to `batch_size` jobs; return the jobs that ran."""
+    return [run_job(job) for job in claim(worker_id, batch_size)]
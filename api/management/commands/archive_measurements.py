@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.archive import archive_system
+from api.models import HydroponicSystem
+
+
+class Command(BaseCommand):
+    help = "Move measurements older than a cutoff into columnar archive files."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-days",
+            type=int,
+            default=365,
+            help="Archive measurements taken before midnight (UTC) this many days ago.",
+        )
+        parser.add_argument(
+            "--system",
+            type=int,
+            action="append",
+            dest="systems",
+            help="Only archive the given system id (can be repeated).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many measurements would be archived.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = (timezone.now() - timedelta(days=options["older_than_days"])).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        systems = HydroponicSystem.objects.order_by("id")
+        if options["systems"]:
+            systems = systems.filter(id__in=options["systems"])
+
+        total = 0
+        for system in systems.iterator():
+            if options["dry_run"]:
+                count = system.measurements.filter(measured_at__lt=cutoff).count()
+                if count:
+                    self.stdout.write(
+                        f"Would archive {count} measurements of '{system}'"
+                    )
+                total += count
+                continue
+
+            archive = archive_system(system, cutoff)
+            if archive:
+                self.stdout.write(
+                    f"Archived {archive.row_count} measurements of '{system}' "
+                    f"into {archive.file}"
+                )
+                total += archive.row_count
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{total} measurements before {cutoff:%Y-%m-%d} archived."
+            )
+            if not options["dry_run"]
+            else f"{total} measurements before {cutoff:%Y-%m-%d} to archive."
+        )
@@ -0,0 +1,71 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from api.ingest import IngestGateway
+
+
+class Command(BaseCommand):
+    help = "Run the line-protocol ingest gateway for sensor readings (TCP and UDP)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="0.0.0.0")
+        parser.add_argument(
+            "--tcp-port", type=int, default=8089, help="TCP port, 0 disables TCP."
+        )
+        parser.add_argument(
+            "--udp-port", type=int, default=8089, help="UDP port, 0 disables UDP."
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Write a batch once this many readings are queued.",
+        )
+        parser.add_argument(
+            "--flush-interval",
+            type=float,
+            default=0.5,
+            help="Write a batch at least this often (seconds).",
+        )
+        parser.add_argument(
+            "--max-pending",
+            type=int,
+            default=10000,
+            help="Queued readings before TCP clients are slowed down and UDP is dropped.",
+        )
+        parser.add_argument(
+            "--stats-interval",
+            type=float,
+            default=1.0,
+            help="Seconds between throughput reports, 0 disables them.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            asyncio.run(self.serve(options))
+        except KeyboardInterrupt:
+            pass
+
+    async def serve(self, options):
+        gateway = IngestGateway(
+            batch_size=options["batch_size"],
+            flush_interval=options["flush_interval"],
+            max_pending=options["max_pending"],
+        )
+        await gateway.start(
+            options["host"],
+            tcp_port=options["tcp_port"] or None,
+            udp_port=options["udp_port"] or None,
+        )
+        self.stdout.write(
+            f"Ingest gateway listening on {options['host']} "
+            f"(tcp {options['tcp_port'] or 'off'}, udp {options['udp_port'] or 'off'})"
+        )
+        try:
+            if options["stats_interval"]:
+                await gateway.report_loop(options["stats_interval"], self.stdout.write)
+            else:
+                await asyncio.Event().wait()
+        finally:
+            await gateway.stop()
@@ -0,0 +1,107 @@
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections
+
+from api.jobs import new_worker_id, prune, run_batch
+from api.models import Job
+
+# Seconds between two prunes of finished jobs by an idle worker.
+PRUNE_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=1,
+            help="Number of worker processes to run in parallel.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10,
+            help="Jobs claimed per query by each worker.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit as soon as the queue is empty instead of polling.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=1.0,
+            help="Seconds to wait before polling an empty queue again.",
+        )
+
+    def handle(self, *args, **options):
+        if options["processes"] <= 1:
+            self.work(options)
+            return
+
+        # Children must open their own database connections
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        workers = [
+            context.Process(target=self.work, args=(options,))
+            for _ in range(options["processes"])
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
+
+    def work(self, options):
+        """
+        Claim and run jobs until interrupted (or the queue is empty with --once).
+
+        When the queue is empty, finished jobs past their retention are
+        deleted, at most once per `PRUNE_INTERVAL`.
+        """
+        worker_id = new_worker_id()
+        next_prune = 0
+        try:
+            while True:
+                try:
+                    jobs = run_batch(worker_id, options["batch_size"])
+                    if not jobs and time.monotonic() >= next_prune:
+                        pruned = prune()
+                        next_prune = time.monotonic() + PRUNE_INTERVAL
+                        if pruned and options["verbosity"] > 1:
+                            self.stdout.write(f"Deleted {pruned} finished jobs")
+                except DatabaseError as e:
+                    # Lost connection or lock contention: back off and retry
+                    self.stderr.write(f"Worker {worker_id} could not claim jobs: {e}")
+                    connections.close_all()
+                    time.sleep(options["sleep"])
+                    continue
+                for job in jobs:
+                    self.report(job, options["verbosity"])
+                if not jobs:
+                    if options["once"]:
+                        return
+                    time.sleep(options["sleep"])
+        except KeyboardInterrupt:
+            return
+
+    def report(self, job, verbosity):
+        if job.status == Job.FAILED:
+            self.stderr.write(
+                f"Job {job.id} {job.name} failed after {job.attempts} attempts:\n"
+                f"{job.last_error}"
+            )
+        elif job.status == Job.PENDING:
+            self.stderr.write(
+                f"Job {job.id} {job.name} failed, retrying after {job.run_after:%H:%M:%S}"
+            )
+        elif verbosity > 1:
+            self.stdout.write(f"Job {job.id} {job.name} done")
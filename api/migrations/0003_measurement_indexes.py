@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-19 03:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0002_measurementarchive"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="sensormeasurement",
+            index=models.Index(
+                fields=["system", "-measured_at"], name="measurement_system_time_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="sensormeasurement",
+            index=models.Index(fields=["-measured_at"], name="measurement_time_idx"),
+        ),
+        migrations.AlterField(
+            model_name="sensormeasurement",
+            name="system",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="measurements",
+                to="api.hydroponicsystem",
+            ),
+        ),
+    ]
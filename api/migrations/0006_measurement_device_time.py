@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-19 03:11
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_job_retries"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="sensormeasurement",
+            name="measured_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
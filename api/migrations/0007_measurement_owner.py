@@ -0,0 +1,113 @@
+# Generated by Django 5.1.6 on 2026-10-19 03:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models, transaction
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def backfill_owner(apps, schema_editor):
+    """
+    Copy each system's owner onto its measurements.
+
+    The migration is not atomic: every batch commits on its own, so rows are
+    only locked for the duration of one short update.
+    """
+    HydroponicSystem = apps.get_model("api", "HydroponicSystem")
+    SensorMeasurement = apps.get_model("api", "SensorMeasurement")
+    using = schema_editor.connection.alias
+    systems = HydroponicSystem.objects.using(using).values_list("id", "owner_id")
+    for system_id, owner_id in systems:
+        missing = SensorMeasurement.objects.using(using).filter(
+            system_id=system_id, owner__isnull=True
+        )
+        while True:
+            with transaction.atomic(using=using):
+                batch = list(missing.values_list("id", flat=True)[:BACKFILL_BATCH_SIZE])
+                if not batch:
+                    break
+                SensorMeasurement.objects.using(using).filter(id__in=batch).update(
+                    owner_id=owner_id
+                )
+
+
+OWNER_TIME_INDEX = models.Index(
+    fields=["owner", "-measured_at"], name="measurement_owner_time_idx"
+)
+TIME_INDEX = models.Index(fields=["-measured_at"], name="measurement_time_idx")
+
+
+def _alter_index(schema_editor, apps, add, index):
+    """Add or drop `index`, without blocking writes (CONCURRENTLY) on PostgreSQL."""
+    model = apps.get_model("api", "SensorMeasurement")
+    options = {"concurrently": True} if schema_editor.connection.vendor == "postgresql" else {}
+    if add:
+        schema_editor.add_index(model, index, **options)
+    else:
+        schema_editor.remove_index(model, index, **options)
+
+
+def replace_time_index(apps, schema_editor):
+    _alter_index(schema_editor, apps, True, OWNER_TIME_INDEX)
+    _alter_index(schema_editor, apps, False, TIME_INDEX)
+
+
+def restore_time_index(apps, schema_editor):
+    _alter_index(schema_editor, apps, True, TIME_INDEX)
+    _alter_index(schema_editor, apps, False, OWNER_TIME_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("api", "0006_measurement_device_time"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sensormeasurement",
+            name="owner",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.RunPython(backfill_owner, migrations.RunPython.noop),
+        # Every measurement has an owner from here on
+        migrations.AlterField(
+            model_name="sensormeasurement",
+            name="owner",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                editable=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        # Built after the backfill, so the update does not maintain it. The
+        # migration is not atomic, so PostgreSQL builds it concurrently.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name="sensormeasurement", index=OWNER_TIME_INDEX
+                ),
+                migrations.RemoveIndex(
+                    model_name="sensormeasurement", name=TIME_INDEX.name
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(replace_time_index, restore_time_index),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-19 04:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_measurement_owner"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="hydroponicsystem",
+            name="analytics_version",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,6 +1,23 @@
+import math
+
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+
+def out_of_band_q(metric):
+    """Return a Q matching measurements whose `metric` is outside its band."""
+    low, high = settings.MEASUREMENT_BANDS[metric]
+    return models.Q(**{f"{metric}__lt": low}) | models.Q(**{f"{metric}__gt": high})
+
+
+class ActiveSystemManager(models.Manager):
+    """Hides systems marked as deleted that are waiting to be purged."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
 
 
 class HydroponicSystem(models.Model):
@@ -8,29 +25,187 @@ class HydroponicSystem(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    deleted_at = models.DateTimeField(blank=True, null=True, editable=False)
+    # Bumped when measurements are edited or deleted; part of the analytics
+    # cache key (see `api.analytics.invalidate_system_analytics`)
+    analytics_version = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = ActiveSystemManager()
+    all_objects = models.Manager()
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """
+        Move the measurements' denormalized owner along with the system.
+
+        Full saves leave `analytics_version` alone, so a stale in-memory copy
+        never undoes a concurrent bump.
+        """
+        update_fields = kwargs.get("update_fields")
+        if not self._state.adding and update_fields is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != "analytics_version"
+            ]
+        with transaction.atomic():
+            transferred = (
+                not self._state.adding
+                and (update_fields is None or "owner" in update_fields)
+                and HydroponicSystem.all_objects.filter(pk=self.pk)
+                .exclude(owner_id=self.owner_id)
+                .exists()
+            )
+            super().save(*args, **kwargs)
+            if transferred:
+                self.measurements.update(owner_id=self.owner_id)
+
+
+class SensorMeasurementManager(models.Manager):
+    def bulk_create(self, objs, *args, **kwargs):
+        """Fill in the denormalized owner from each measurement's system."""
+        objs = list(objs)
+        owners = dict(
+            HydroponicSystem.all_objects.filter(
+                id__in={obj.system_id for obj in objs}
+            ).values_list("id", "owner_id")
+        )
+        for obj in objs:
+            obj.owner_id = owners.get(obj.system_id)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_ingest(self, measurements, batch_size=1000):
+        """
+        Validate unsaved measurements and insert the valid ones in bulk.
+
+        Runs the same field and `clean()` validation as `save()`, except for
+        the per-row system lookup: callers must only pass systems they have
+        checked. Returns `(created, rejected)`, where `rejected` holds
+        `(measurement, ValidationError)` pairs.
+        """
+        valid, rejected = [], []
+        for measurement in measurements:
+            try:
+                measurement.full_clean(exclude=["system"])
+            except ValidationError as e:
+                rejected.append((measurement, e))
+            else:
+                valid.append(measurement)
+        return self.bulk_create(valid, batch_size=batch_size), rejected
+
 
 class SensorMeasurement(models.Model):
     system = models.ForeignKey(
-        HydroponicSystem, on_delete=models.CASCADE, related_name="measurements"
+        HydroponicSystem,
+        on_delete=models.CASCADE,
+        related_name="measurements",
+        db_index=False,  # Covered by the (system, measured_at) index
+    )
+    # Copy of `system.owner`, so owner-wide listings need no join. Kept in
+    # step by `save()`, `SensorMeasurement.objects.bulk_create()` and
+    # `HydroponicSystem.save()`; queryset `.update(owner=...)` on systems and
+    # raw SQL bypass them and must update the measurements themselves.
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+",
+        blank=True,  # Filled in on save, after validation
+        editable=False,
+        db_index=False,  # Covered by the (owner, measured_at) index
     )
     ph = models.FloatField()
     temperature = models.FloatField()
     tds = models.FloatField()
-    measured_at = models.DateTimeField(auto_now_add=True)
+    # Defaults to the time of saving; ingest paths may pass the device time
+    measured_at = models.DateTimeField(default=timezone.now)
+
+    objects = SensorMeasurementManager()
+
+    class Meta:
+        indexes = [
+            # Per-system listings and time-range filters
+            models.Index(
+                fields=["system", "-measured_at"], name="measurement_system_time_idx"
+            ),
+            # Owner-wide listings ordered by time
+            models.Index(
+                fields=["owner", "-measured_at"], name="measurement_owner_time_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"pH: {self.ph}, Temp: {self.temperature}, TDS: {self.tds}"
 
     def clean(self):
-        """Ensure that the pH value is within a valid range (0-14)."""
+        """Ensure that readings are finite and the pH is within a valid range (0-14)."""
+        errors = {
+            metric: "Enter a finite number."
+            for metric in ("ph", "temperature", "tds")
+            if isinstance(getattr(self, metric), float)
+            and not math.isfinite(getattr(self, metric))
+        }
+        if errors:  # NaN and infinity are not valid JSON and break the analytics
+            raise ValidationError(errors)
         if not (0 <= self.ph <= 14):
             raise ValidationError({"ph": "pH value must be between 0 and 14."})
 
     def save(self, *args, **kwargs):
         """Run model validation before saving."""
         self.full_clean()  # This ensures model validation runs before saving
+        self.owner_id = self.system.owner_id
         super().save(*args, **kwargs)
+
+
+class MeasurementArchive(models.Model):
+    """A closed range of a system's measurements moved into a columnar file."""
+
+    system = models.ForeignKey(
+        HydroponicSystem, on_delete=models.CASCADE, related_name="archives"
+    )
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    row_count = models.PositiveIntegerField()
+    file = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["system", "start"]
+
+    def __str__(self):
+        return f"{self.system}: {self.start:%Y-%m-%d} - {self.end:%Y-%m-%d}"
+
+
+class Job(models.Model):
+    """A unit of background work executed by the `run_jobs` worker."""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    dedupe_key = models.CharField(max_length=100, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    run_after = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_after"], name="job_queue_idx")]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
@@ -0,0 +1,51 @@
+"""
+Compact binary rendering of measurement data.
+
+Clients that send `Accept: application/msgpack` (or `?format=msgpack`) get
+MessagePack instead of JSON. Measurement series are sent as packed columns:
+each NumPy array becomes a single `bin` value with the raw little-endian
+array data, and `dtypes` maps every column to its NumPy dtype string, so a
+client decodes a column with `numpy.frombuffer(data[name], data["dtypes"][name])`
+instead of parsing one value at a time. Timestamps are int64 epoch
+microseconds; other datetimes use the MessagePack timestamp extension.
+"""
+
+import msgpack
+import numpy as np
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer
+
+
+def columns(**arrays):
+    """Return NumPy arrays as packed columns plus their `dtypes`."""
+    arrays = {
+        name: np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+        for name, array in arrays.items()
+    }
+    return {
+        "dtypes": {name: array.dtype.str for name, array in arrays.items()},
+        **arrays,
+    }
+
+
+def _encode(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tobytes()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, Promise):  # Lazy translations in error messages
+        return force_str(obj)
+    raise TypeError(f"Cannot serialize {type(obj).__name__} to MessagePack.")
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=_encode, datetime=True)
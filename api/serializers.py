@@ -8,7 +8,7 @@ class HydroponicSystemSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = HydroponicSystem
-        fields = "__all__"
+        exclude = ["deleted_at", "analytics_version"]  # Internal bookkeeping
         read_only_fields = ["owner"]
 
     def get_latest_measurements(self, obj):
@@ -29,7 +29,7 @@ class HydroponicSystemSerializer(serializers.ModelSerializer):
 class SensorMeasurementSerializer(serializers.ModelSerializer):
     class Meta:
         model = SensorMeasurement
-        fields = "__all__"
+        exclude = ["owner"]  # Internal copy of `system.owner`
         read_only_fields = ["measured_at"]
 
 
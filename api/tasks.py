@@ -0,0 +1,76 @@
+"""Background job handlers, registered when the app is ready."""
+
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+
+from .analytics import system_analytics
+from .archive import archive_storage
+from .checks import PROCESS_LOCAL_CACHES
+from .jobs import enqueue, heartbeat, job
+from .models import HydroponicSystem, SensorMeasurement
+
+PURGE_BATCH_SIZE = 5000
+
+
+@job("purge_system")
+def purge_system(system_id):
+    """
+    Delete a system marked as deleted together with its history.
+
+    Measurements are deleted in short batches, each in its own transaction,
+    so no long lock is held however large the history is. The job's lock is
+    renewed after every batch.
+    """
+    system = HydroponicSystem.all_objects.filter(
+        id=system_id, deleted_at__isnull=False
+    ).first()
+    if system is None:
+        return
+
+    while True:
+        batch = list(
+            SensorMeasurement.objects.filter(system_id=system_id).values_list(
+                "id", flat=True
+            )[:PURGE_BATCH_SIZE]
+        )
+        if not batch:
+            break
+        SensorMeasurement.objects.filter(id__in=batch).delete()
+        heartbeat()
+
+    storage = archive_storage()
+    for archive in system.archives.all():
+        storage.delete(archive.file)
+    system.delete()
+
+
+@job("refresh_system_analytics")
+def refresh_system_analytics(system_id):
+    """Recompute the cached all-time analytics of a system after new readings."""
+    system = HydroponicSystem.objects.filter(id=system_id).first()
+    if system is not None:
+        system_analytics(system)
+
+
+def measurements_added(system_ids):
+    """
+    Queue the follow-up work for systems that received new measurements.
+
+    Jobs are queued once the surrounding transaction commits and are
+    deduplicated per system, so a burst of readings causes a single run.
+    Refreshed analytics are only useful in a cache the web processes share
+    with the worker, so nothing is queued with a per-process cache.
+    """
+    if settings.CACHES["default"]["BACKEND"] in PROCESS_LOCAL_CACHES:
+        return
+    for system_id in set(system_ids):
+        transaction.on_commit(
+            partial(
+                enqueue,
+                "refresh_system_analytics",
+                dedupe_key=str(system_id),
+                system_id=system_id,
+            )
+        )
@@ -1,10 +1,59 @@
+import asyncio
+import gzip
+import json
 import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+from unittest import mock, skipIf, skipUnless
+import brotli
+import msgpack
+import numpy as np
+from asgiref.sync import async_to_sync
 from dotenv import load_dotenv
+from django.apps import apps as django_apps
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.test import TestCase
-from rest_framework.test import APIClient
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from drf_yasg.generators import OpenAPISchemaGenerator
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
 from rest_framework import status
-from api.models import HydroponicSystem, SensorMeasurement
+from rest_framework_simplejwt.tokens import AccessToken
+from HydroponicsSystem.schema import SchemaView
+from HydroponicsSystem.settings import env_bool
+from api.analytics import (
+    compute_analytics,
+    invalidate_system_analytics,
+    system_analytics,
+)
+from api import archive as archive_module
+from api.archive import archive_storage, from_epoch_us, read_history, to_epoch_us
+from api.checks import check_replica_cache
+from api.db_routers import (
+    ReplicaRouter,
+    has_recent_write,
+    use_replica,
+)
+from api.ingest import IngestGateway, LineProtocolError, authenticate, parse_line
+from api.jobs import claim, enqueue, heartbeat, job, run_batch
+from api.models import HydroponicSystem, Job, MeasurementArchive, SensorMeasurement
 from django.urls import reverse
 
 # Load environment variables
@@ -15,6 +64,10 @@ USERNAME = os.getenv("USERNAME")
 PASSWORD = os.getenv("PASSWORD")
 OTHER_USERNAME = os.getenv("OTHER_USERNAME")
 OTHER_PASSWORD = os.getenv("OTHER_PASSWORD")
+# Import time allowed for a production worker to load the application (the
+# median of IMPORT_TIME_SAMPLES cold starts); 0 disables the check
+IMPORT_TIME_BUDGET_MS = int(os.getenv("IMPORT_TIME_BUDGET_MS", "1500"))
+IMPORT_TIME_SAMPLES = 5
 
 
 class HydroponicSystemTests(TestCase):
@@ -153,6 +206,9 @@ class HydroponicSystemTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn("latest_measurements", response.data)
         self.assertEqual(len(response.data["latest_measurements"]), 10)
+        # Internal bookkeeping columns are not part of the API
+        self.assertNotIn("deleted_at", response.data)
+        self.assertNotIn("owner", response.data["latest_measurements"][0])
 
 
 class SensorMeasurementTests(TestCase):
@@ -192,6 +248,23 @@ class SensorMeasurementTests(TestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_non_finite_measurement_values(self):
+        """Test submitting NaN or infinite readings (should fail)"""
+        response = self.client.post(
+            f"{BASE_URL}/api/measurements/",
+            {"system": self.system.id, "ph": 7.0, "temperature": "inf", "tds": 600},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("temperature", response.data)
+
+        response = self.client.patch(
+            f"{BASE_URL}/api/measurements/{self.measurement.id}/", {"tds": "nan"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("tds", response.data)
+        self.measurement.refresh_from_db()
+        self.assertEqual(self.measurement.tds, 500)
+
     def test_list_measurements(self):
         """Test retrieving a list of measurements"""
         response = self.client.get(f"{BASE_URL}/api/measurements/")
@@ -366,3 +439,1269 @@ class UserRegistrationTests(TestCase):
         self.client.logout()
         response = self.client.get(f"{BASE_URL}/api/systems/")
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(
+    DATABASE_REPLICAS=["replica"],
+    DATABASE_ROUTERS=["api.db_routers.ReplicaRouter"],
+    DATABASE_REPLICA_STICKY_SECONDS=5,
+)
+@skipUnless(
+    "replica" in settings.DATABASES,
+    "Run with --settings=HydroponicsSystem.test_settings for the replica alias",
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    # "replica" is a second connection mirroring the default test database
+    # (see HydroponicsSystem/test_settings.py). Its reads only see committed
+    # rows, hence TransactionTestCase.
+    databases = {"default", "replica"} & set(settings.DATABASES)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username=USERNAME, password=PASSWORD)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.system = HydroponicSystem.objects.create(
+            owner=self.user, name="Test System"
+        )
+        self.router = ReplicaRouter()
+
+    def test_reads_use_primary_by_default(self):
+        """Test that reads outside `use_replica` are left to the default database"""
+        self.assertIsNone(self.router.db_for_read(SensorMeasurement))
+
+    def test_reads_inside_use_replica_go_to_replica(self):
+        """Test that reads inside `use_replica` are routed to a replica"""
+        with use_replica():
+            self.assertEqual(self.router.db_for_read(SensorMeasurement), "replica")
+        self.assertIsNone(self.router.db_for_read(SensorMeasurement))
+
+    def test_writes_always_use_primary(self):
+        """Test that writes are never routed to a replica"""
+        with use_replica():
+            self.assertEqual(self.router.db_for_write(SensorMeasurement), "default")
+
+    def test_list_is_served_from_replica(self):
+        """Test that listing measurements runs its queries on the replica"""
+        SensorMeasurement.objects.create(
+            system=self.system, ph=7.0, temperature=23.0, tds=600
+        )
+        with CaptureQueriesContext(connections["replica"]) as replica_queries:
+            response = self.client.get(f"{BASE_URL}/api/measurements/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 1)
+        self.assertTrue(
+            any("api_sensormeasurement" in query["sql"] for query in replica_queries)
+        )
+
+    def test_read_after_write_uses_primary(self):
+        """Test that a client reads from the primary right after writing"""
+        response = self.client.post(
+            f"{BASE_URL}/api/measurements/",
+            {"system": self.system.id, "ph": 7.0, "temperature": 23.0, "tds": 600},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(has_recent_write(self.user))
+        with CaptureQueriesContext(connections["replica"]) as replica_queries:
+            response = self.client.get(f"{BASE_URL}/api/measurements/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(len(replica_queries), 0)
+
+    def test_failed_replica_action_restores_primary(self):
+        """Test that an unhandled error in a replica action leaves reads on the primary"""
+        self.client.raise_request_exception = False
+        with mock.patch(
+            "api.views.HydroponicSystemViewSet.fleet", side_effect=RuntimeError
+        ):
+            response = self.client.get(f"{BASE_URL}/api/systems/fleet/")
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertIsNone(self.router.db_for_read(HydroponicSystem))
+
+    def test_replicas_require_shared_cache(self):
+        """Test that a per-process cache is rejected when replicas are configured"""
+        self.assertEqual(
+            [error.id for error in check_replica_cache(None)], ["api.E001"]
+        )
+        shared = {
+            "default": {
+                "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+                "LOCATION": "cache_table",
+            }
+        }
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_replica_cache(None), [])
+
+
+class NoReplicaTests(TestCase):
+    def test_no_cache_access_without_replicas(self):
+        """Test that requests skip the read-your-writes cache without replicas"""
+        user = User.objects.create_user(username=USERNAME, password=PASSWORD)
+        client = APIClient()
+        client.force_authenticate(user=user)
+        system = HydroponicSystem.objects.create(owner=user, name="Test System")
+        with (
+            mock.patch("api.views.has_recent_write") as checked,
+            mock.patch("api.views.mark_recent_write") as marked,
+        ):
+            client.post(
+                f"{BASE_URL}/api/measurements/",
+                {"system": system.id, "ph": 7.0, "temperature": 23.0, "tds": 600},
+            )
+            client.get(f"{BASE_URL}/api/measurements/")
+        checked.assert_not_called()
+        marked.assert_not_called()
+
+
+class MeasurementArchiveTests(TestCase):
+    def setUp(self):
+        archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_dir)
+        storages = {
+            **settings.STORAGES,
+            "measurement_archive": {
+                "BACKEND": "django.core.files.storage.FileSystemStorage",
+                "OPTIONS": {"location": archive_dir},
+            },
+        }
+        override = override_settings(STORAGES=storages)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user(username=USERNAME, password=PASSWORD)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.system = HydroponicSystem.objects.create(
+            owner=self.user, name="Test System"
+        )
+        self.old_time = timezone.now() - timedelta(days=400)
+        for i in range(5):
+            measurement = SensorMeasurement.objects.create(
+                system=self.system, ph=6.0 + i / 10, temperature=20.0 + i, tds=500 + i
+            )
+            SensorMeasurement.objects.filter(pk=measurement.pk).update(
+                measured_at=self.old_time + timedelta(hours=i)
+            )
+        SensorMeasurement.objects.create(
+            system=self.system, ph=7.0, temperature=25.0, tds=800
+        )
+
+    def archive(self, *args):
+        call_command("archive_measurements", *args, stdout=StringIO())
+
+    def test_archive_moves_old_measurements(self):
+        """Test that measurements older than the cutoff are moved into a file"""
+        self.archive("--older-than-days", "365")
+        self.assertEqual(SensorMeasurement.objects.count(), 1)
+        archive = MeasurementArchive.objects.get()
+        self.assertEqual(archive.row_count, 5)
+        self.assertEqual(
+            archive_storage().size(archive.file), 16 + 5 * (8 + 3 * 4)
+        )  # Header plus int64 timestamp and three float32 values per row
+
+    def test_archive_dry_run(self):
+        """Test that a dry run does not touch any measurement"""
+        self.archive("--older-than-days", "365", "--dry-run")
+        self.assertEqual(SensorMeasurement.objects.count(), 6)
+        self.assertFalse(MeasurementArchive.objects.exists())
+
+    def test_history_merges_archived_and_live_measurements(self):
+        """Test that the history reads archived ranges transparently"""
+        self.archive("--older-than-days", "365")
+        response = self.client.get(f"{BASE_URL}/api/systems/{self.system.id}/history/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 6)
+        self.assertEqual(response.data["ph"], [6.0, 6.1, 6.2, 6.3, 6.4, 7.0])
+        self.assertEqual(response.data["tds"][-1], 800)
+        self.assertEqual(
+            response.data["measured_at"], sorted(response.data["measured_at"])
+        )
+
+    def test_history_time_range(self):
+        """Test that the history can be limited to a time range"""
+        self.archive("--older-than-days", "365")
+        start = (self.old_time + timedelta(hours=2)).isoformat()
+        end = (timezone.now() - timedelta(days=30)).isoformat()
+        response = self.client.get(
+            f"{BASE_URL}/api/systems/{self.system.id}/history/",
+            {"start": start, "end": end},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["ph"], [6.2, 6.3, 6.4])
+
+    def test_history_pages(self):
+        """Test that the history is returned in pages linked by `next`"""
+        self.archive("--older-than-days", "365")
+        url = f"{BASE_URL}/api/systems/{self.system.id}/history/?limit=2"
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data["ph"])
+            url = response.data["next"]
+        self.assertEqual(pages, [[6.0, 6.1], [6.2, 6.3], [6.4, 7.0]])
+
+    def test_history_page_keeps_simultaneous_readings_together(self):
+        """Test that readings with the same timestamp are not split across pages"""
+        system = HydroponicSystem.objects.create(owner=self.user, name="Burst")
+        now = timezone.now()
+        SensorMeasurement.objects.bulk_create(
+            SensorMeasurement(
+                system=system, ph=ph, temperature=20, tds=500, measured_at=time
+            )
+            for ph, time in (
+                (6.0, now),
+                (6.1, now),
+                (6.2, now),
+                (6.3, now + timedelta(days=1)),
+            )
+        )
+        for limit in (1, 2, 3):
+            response = self.client.get(
+                f"{BASE_URL}/api/systems/{system.id}/history/", {"limit": limit}
+            )
+            self.assertEqual(response.data["ph"], [6.0, 6.1, 6.2])
+            response = self.client.get(response.data["next"])
+            self.assertEqual(response.data["ph"], [6.3])
+            self.assertIsNone(response.data["next"])
+
+    def test_history_invalid_limit(self):
+        """Test that page sizes above `HISTORY_PAGE_SIZE` are rejected"""
+        for limit in ("0", "abc", str(settings.HISTORY_PAGE_SIZE + 1)):
+            response = self.client.get(
+                f"{BASE_URL}/api/systems/{self.system.id}/history/", {"limit": limit}
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_archived_values_keep_their_digits(self):
+        """Test that float32 storage does not change readings with six digits"""
+        SensorMeasurement.objects.filter(system=self.system).update(tds=1234.57)
+        self.archive("--older-than-days", "365")
+        series = read_history(self.system)
+        self.assertEqual(series.tds.tolist(), [1234.57] * 6)
+
+    def test_history_rereads_after_concurrent_archive(self):
+        """Test that rows archived while the history is read are not lost"""
+        read_live = archive_module._read_live
+
+        def archive_first(*args):
+            if not MeasurementArchive.objects.exists():  # Commits in between
+                self.archive("--older-than-days", "365")
+            return read_live(*args)
+
+        with mock.patch("api.archive._read_live", side_effect=archive_first):
+            series = read_history(self.system)
+        self.assertEqual(series.ph.tolist(), [6.0, 6.1, 6.2, 6.3, 6.4, 7.0])
+
+    def test_failed_archive_keeps_rows(self):
+        """Test that a failure while archiving keeps the rows and drops the file"""
+        storage = archive_storage()
+        with mock.patch(
+            "api.archive.MeasurementArchive.objects.create", side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                self.archive("--older-than-days", "365")
+        self.assertEqual(SensorMeasurement.objects.count(), 6)
+        self.assertEqual(storage.listdir(str(self.system.id))[1], [])
+
+    def test_history_invalid_date(self):
+        """Test that an invalid range boundary is rejected"""
+        response = self.client.get(
+            f"{BASE_URL}/api/systems/{self.system.id}/history/?start=yesterday"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_history_of_other_user_system(self):
+        """Test reading another user's history (should fail)"""
+        other_user = User.objects.create_user(
+            username=OTHER_USERNAME, password=OTHER_PASSWORD
+        )
+        other_system = HydroponicSystem.objects.create(
+            owner=other_user, name="Other System"
+        )
+        response = self.client.get(f"{BASE_URL}/api/systems/{other_system.id}/history/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class SystemAnalyticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username=USERNAME, password=PASSWORD)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.system = HydroponicSystem.objects.create(
+            owner=self.user, name="Test System"
+        )
+        start = timezone.now().replace(
+            hour=0, minute=0, second=0, microsecond=0
+        ) - timedelta(days=4)
+        for i in range(4 * 24):  # Hourly readings over four days
+            temperature = 20.0 + (i % 24) / 4
+            measurement = SensorMeasurement.objects.create(
+                system=self.system,
+                ph=temperature / 4,
+                temperature=temperature,
+                tds=500 + 10 * i / 24,
+            )
+            SensorMeasurement.objects.filter(pk=measurement.pk).update(
+                measured_at=start + timedelta(hours=i)
+            )
+        self.url = f"{BASE_URL}/api/systems/{self.system.id}/analytics/"
+
+    def test_analytics(self):
+        """Test correlation, TDS drift and the diurnal temperature curve"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 96)
+        self.assertAlmostEqual(response.data["ph_temperature_correlation"], 1.0)
+        self.assertAlmostEqual(response.data["tds_drift_per_day"], 10.0)
+        self.assertEqual(len(response.data["diurnal_temperature"]), 24)
+        self.assertAlmostEqual(response.data["diurnal_temperature"][0], 20.0)
+        self.assertAlmostEqual(response.data["diurnal_temperature"][12], 23.0)
+
+    def test_analytics_without_measurements(self):
+        """Test analytics of a system without measurements"""
+        system = HydroponicSystem.objects.create(owner=self.user, name="Empty")
+        response = self.client.get(f"{BASE_URL}/api/systems/{system.id}/analytics/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 0)
+        self.assertIsNone(response.data["ph_temperature_correlation"])
+        self.assertIsNone(response.data["tds_drift_per_day"])
+
+    def test_analytics_are_cached_until_next_measurement(self):
+        """Test that repeated requests reuse the cached result"""
+        with mock.patch(
+            "api.analytics.compute_analytics", wraps=compute_analytics
+        ) as computed:
+            self.client.get(self.url)
+            self.client.get(self.url)
+            self.assertEqual(computed.call_count, 1)
+
+            SensorMeasurement.objects.create(
+                system=self.system, ph=6.5, temperature=22.0, tds=600
+            )
+            response = self.client.get(self.url)
+            self.assertEqual(computed.call_count, 2)
+        self.assertEqual(response.data["count"], 97)
+
+    def test_analytics_invalidated_by_edits_and_deletes(self):
+        """Test that changing or deleting a reading recomputes the analytics"""
+        self.client.get(self.url)
+        measurement = self.system.measurements.earliest("measured_at")
+        response = self.client.patch(
+            f"{BASE_URL}/api/measurements/{measurement.id}/", {"tds": 5000}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(self.url)
+        self.assertLess(response.data["tds_drift_per_day"], 0)
+
+        response = self.client.delete(f"{BASE_URL}/api/measurements/{measurement.id}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["count"], 95)
+        self.assertAlmostEqual(response.data["tds_drift_per_day"], 10.0)
+
+    def test_invalidation_survives_system_saves(self):
+        """Test that the version is kept in the database and not reset by saves"""
+        invalidate_system_analytics(self.system.id)
+        self.system.name = "Renamed"  # Stale copy with analytics_version 0
+        self.system.save()
+        self.system.refresh_from_db()
+        self.assertEqual(self.system.analytics_version, 1)
+
+    def test_analytics_of_other_user_system(self):
+        """Test reading another user's analytics (should fail)"""
+        other_user = User.objects.create_user(
+            username=OTHER_USERNAME, password=OTHER_PASSWORD
+        )
+        other_system = HydroponicSystem.objects.create(
+            owner=other_user, name="Other System"
+        )
+        response = self.client.get(
+            f"{BASE_URL}/api/systems/{other_system.id}/analytics/"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class FleetSummaryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username=USERNAME, password=PASSWORD)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.systems = [
+            HydroponicSystem.objects.create(owner=self.user, name=f"System {i}")
+            for i in range(3)
+        ]
+        for system in self.systems[:2]:
+            for ph in (5.0, 6.0, 7.0):
+                SensorMeasurement.objects.create(
+                    system=system, ph=ph, temperature=22.0, tds=800
+                )
+        old = SensorMeasurement.objects.create(
+            system=self.systems[0], ph=1.0, temperature=10.0, tds=100
+        )
+        SensorMeasurement.objects.filter(pk=old.pk).update(
+            measured_at=timezone.now() - timedelta(days=2)
+        )
+
+    def test_fleet_summary(self):
+        """Test latest readings and 24h statistics for every system"""
+        response = self.client.get(f"{BASE_URL}/api/systems/fleet/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 3)
+        summary = {row["id"]: row for row in response.data["results"]}
+
+        first = summary[self.systems[0].id]
+        self.assertEqual(first["latest"]["ph"], 7.0)
+        self.assertEqual(first["last_24h"]["count"], 3)  # Old reading excluded
+        self.assertEqual(first["last_24h"]["ph"]["min"], 5.0)
+        self.assertEqual(first["last_24h"]["ph"]["max"], 7.0)
+        self.assertAlmostEqual(first["last_24h"]["ph"]["mean"], 6.0)
+        self.assertEqual(first["last_24h"]["ph"]["out_of_band"], 2)
+        self.assertEqual(first["last_24h"]["temperature"]["out_of_band"], 0)
+
+        empty = summary[self.systems[2].id]
+        self.assertIsNone(empty["latest"])
+        self.assertEqual(empty["last_24h"]["count"], 0)
+
+    def test_fleet_summary_uses_constant_queries(self):
+        """Test that the number of queries does not grow with the fleet"""
+        with self.assertNumQueries(4):  # count, page, latest readings, statistics
+            self.client.get(f"{BASE_URL}/api/systems/fleet/")
+        for i in range(5):
+            system = HydroponicSystem.objects.create(owner=self.user, name=f"More {i}")
+            SensorMeasurement.objects.create(
+                system=system, ph=6.0, temperature=22.0, tds=800
+            )
+        with self.assertNumQueries(4):
+            response = self.client.get(f"{BASE_URL}/api/systems/fleet/")
+        self.assertEqual(len(response.data["results"]), 8)
+
+    def test_fleet_summary_only_includes_own_systems(self):
+        """Test that other users' systems are not summarised"""
+        other_user = User.objects.create_user(
+            username=OTHER_USERNAME, password=OTHER_PASSWORD
+        )
+        HydroponicSystem.objects.create(owner=other_user, name="Other System")
+        response = self.client.get(f"{BASE_URL}/api/systems/fleet/")
+        self.assertEqual(response.data["count"], 3)
+
+
+class MeasurementFilterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username=USERNAME, password=PASSWORD)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.system = HydroponicSystem.objects.create(
+            owner=self.user, name="Test System"
+        )
+        self.now = timezone.now()
+        for days, ph, temperature in ((0, 6.0, 22.0), (2, 7.5, 23.0), (5, 5.0, 30.0)):
+            measurement = SensorMeasurement.objects.create(
+                system=self.system, ph=ph, temperature=temperature, tds=800
+            )
+            SensorMeasurement.objects.filter(pk=measurement.pk).update(
+                measured_at=self.now - timedelta(days=days)
+            )
+
+    def get_results(self, params):
+        response = self.client.get(f"{BASE_URL}/api/measurements/", params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["results"]
+
+    def test_filter_time_range(self):
+        """Test filtering measurements by a measurement date range"""
+        results = self.get_results(
+            {
+                "measured_at__gte": (self.now - timedelta(days=3)).isoformat(),
+                "measured_at__lt": (self.now - timedelta(days=1)).isoformat(),
+            }
+        )
+        self.assertEqual([result["ph"] for result in results], [7.5])
+
+    def test_filter_value_range(self):
+        """Test filtering measurements by a pH range"""
+        results = self.get_results({"ph__gte": 5.5, "ph__lte": 7.0})
+        self.assertEqual([result["ph"] for result in results], [6.0])
+
+    def test_filter_out_of_band(self):
+        """Test filtering measurements outside the configured bands"""
+        results = self.get_results({"out_of_band": "ph"})
+        self.assertEqual(sorted(result["ph"] for result in results), [5.0, 7.5])
+        results = self.get_results({"out_of_band": "temperature"})
+        self.assertEqual([result["temperature"] for result in results], [30.0])
+        results = self.get_results({"out_of_band": "any"})
+        self.assertEqual(len(results), 2)
+
+    def test_filter_invalid_out_of_band(self):
+        """Test filtering by an unknown metric (should fail)"""
+        response = self.client.get(f"{BASE_URL}/api/measurements/?out_of_band=co2")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_time_range_query_uses_index(self):
+        """Test that per-system time ranges are served by the (system, measured_at) index"""
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:  # Tiny tables favour sequential scans
+                cursor.execute("SET enable_seqscan = off")
+        queryset = SensorMeasurement.objects.filter(
+            system=self.system,
+            measured_at__gte=self.now - timedelta(days=3),
+            measured_at__lt=self.now,
+        ).order_by("-measured_at")
+        self.assertIn("measurement_system_time_idx", queryset.explain())
+
+
+class BackgroundDeletionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username=USERNAME, password=PASSWORD)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.system = HydroponicSystem.objects.create(
+            owner=self.user, name="Test System"
+        )
+        SensorMeasurement.objects.bulk_create(
+            SensorMeasurement(system=self.system, ph=6.5, temperature=22.0, tds=500)
+            for _ in range(20)
+        )
+
+    def run_jobs(self):
+        call_command("run_jobs", "--once", stdout=StringIO(), stderr=StringIO())
+
+    def test_delete_hides_system_and_queues_purge(self):
+        """Test that deleting a system hides it without deleting its history"""
+        response = self.client.delete(f"{BASE_URL}/api/systems/{self.system.id}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(HydroponicSystem.objects.exists())
+        self.assertEqual(SensorMeasurement.objects.count(), 20)
+        self.assertEqual(Job.objects.get().name, "purge_system")
+
+        response = self.client.get(f"{BASE_URL}/api/systems/{self.system.id}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(f"{BASE_URL}/api/measurements/")
+        self.assertEqual(response.data["count"], 0)
+
+    def test_worker_purges_deleted_system(self):
+        """Test that the worker removes the measurements and the system"""
+        self.client.delete(f"{BASE_URL}/api/systems/{self.system.id}/")
+        with mock.patch("api.tasks.PURGE_BATCH_SIZE", 7):  # Several batches
+            self.run_jobs()
+        self.assertFalse(SensorMeasurement.objects.exists())
+        self.assertFalse(HydroponicSystem.all_objects.exists())
+        self.assertEqual(Job.objects.get().status, Job.DONE)
+
+    def test_delete_cost_does_not_depend_on_history(self):
+        """Test that the delete request runs the same queries for any history size"""
+        empty_system = HydroponicSystem.objects.create(owner=self.user, name="Empty")
+        with CaptureQueriesContext(connection) as empty_queries:
+            self.client.delete(f"{BASE_URL}/api/systems/{empty_system.id}/")
+        with self.assertNumQueries(len(empty_queries)):
+            self.client.delete(f"{BASE_URL}/api/systems/{self.system.id}/")
+
+    def test_name_can_be_reused_after_delete(self):
+        """Test creating a system with the name of a deleted one"""
+        self.client.delete(f"{BASE_URL}/api/systems/{self.system.id}/")
+        response = self.client.post(f"{BASE_URL}/api/systems/", {"name": "Test System"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_failed_job_is_retried(self):
+        """Test that a failing job is rescheduled with its traceback recorded"""
+        self.client.delete(f"{BASE_URL}/api/systems/{self.system.id}/")
+        with mock.patch(
+            "api.tasks.HydroponicSystem.all_objects.filter",
+            side_effect=RuntimeError("boom"),
+        ):
+            self.run_jobs()
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn("boom", job.last_error)
+
+
+@job("test_flaky")
+def flaky_job(fail):
+    if fail:
+        raise RuntimeError("boom")
+
+
+@job("test_long")
+def long_job():
+    Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))  # Time passes
+    heartbeat()
+    long_job.claims.append(claim("other"))
+
+
+@job("test_taken_over")
+def taken_over_job(beat):
+    Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+    claim("other")
+    if beat:
+        heartbeat()
+
+
+class JobQueueTests(TestCase):
+    def test_job_fails_after_max_attempts(self):
+        """Test that a job is retried with backoff and then marked as failed"""
+        queued = enqueue("test_flaky", fail=True)
+        queued.max_attempts = 2
+        queued.save()
+
+        run_batch("worker")
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.PENDING)
+        self.assertEqual(run_batch("worker"), [])  # Backoff not elapsed yet
+
+        Job.objects.update(run_after=timezone.now())
+        run_batch("worker")
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.FAILED)
+        self.assertEqual(queued.attempts, 2)
+
+    def test_claim_batch(self):
+        """Test that a worker claims several jobs at once and others skip them"""
+        for _ in range(3):
+            enqueue("test_flaky", fail=False)
+        self.assertEqual(len(claim("first", limit=2)), 2)
+        self.assertEqual(len(claim("second", limit=2)), 1)
+        self.assertEqual(claim("third", limit=2), [])
+
+    def test_stale_job_is_reclaimed(self):
+        """Test that jobs of a dead worker are picked up again"""
+        enqueue("test_flaky", fail=False)
+        claim("dead")
+        self.assertEqual(claim("alive"), [])
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(len(claim("alive")), 1)
+
+    def test_stale_job_without_attempts_left_fails(self):
+        """Test that a stale job is not run again once it used all its attempts"""
+        queued = enqueue("test_flaky", fail=False)
+        queued.max_attempts = 1
+        queued.save()
+        claim("dead")
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(claim("alive"), [])
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.FAILED)
+        self.assertEqual(queued.attempts, 1)
+
+    def test_heartbeat_keeps_long_job_locked(self):
+        """Test that a job renewing its lock is not reclaimed"""
+        long_job.claims = []
+        queued = enqueue("test_long")
+        run_batch("worker")
+        self.assertEqual(long_job.claims, [[]])
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.DONE)
+        self.assertEqual(queued.attempts, 1)
+
+    def test_reclaimed_job_is_left_to_new_worker(self):
+        """Test that a worker that lost its lock does not record an outcome"""
+        for beat in (False, True):
+            with self.subTest(beat=beat):
+                queued = enqueue("test_taken_over", beat=beat)
+                run_batch("worker")
+                queued.refresh_from_db()
+                self.assertEqual(queued.status, Job.RUNNING)
+                self.assertEqual(queued.locked_by, "other")
+                self.assertEqual(queued.attempts, 2)
+                queued.delete()
+
+    def test_enqueue_deduplicates_pending_jobs(self):
+        """Test that a pending job with the same key is reused"""
+        first = enqueue("test_flaky", dedupe_key="a", fail=False)
+        self.assertEqual(enqueue("test_flaky", dedupe_key="a", fail=False), first)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_enqueue_unknown_job(self):
+        """Test queueing a job without a handler (should fail)"""
+        with self.assertRaises(ValueError):
+            enqueue("does_not_exist")
+
+    def post_measurements(self, system):
+        client = APIClient()
+        client.force_authenticate(user=system.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(3):
+                response = client.post(
+                    f"{BASE_URL}/api/measurements/",
+                    {"system": system.id, "ph": 6.0, "temperature": 22.0, "tds": 600},
+                )
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_measurement_creation_queues_analytics_refresh(self):
+        """Test that new readings queue one analytics refresh per system"""
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        shared = {
+            "default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": cache_dir,
+            }
+        }
+        user = User.objects.create_user(username=USERNAME, password=PASSWORD)
+        system = HydroponicSystem.objects.create(owner=user, name="Test System")
+        with override_settings(CACHES=shared):
+            self.post_measurements(system)
+            queued = Job.objects.get()
+            self.assertEqual(queued.name, "refresh_system_analytics")
+            self.assertEqual(queued.payload, {"system_id": system.id})
+
+            with mock.patch(
+                "api.tasks.system_analytics", wraps=system_analytics
+            ) as refreshed:
+                call_command("run_jobs", "--once", stdout=StringIO())
+        refreshed.assert_called_once_with(system)
+        self.assertEqual(Job.objects.get().status, Job.DONE)
+
+    def test_no_analytics_refresh_with_process_local_cache(self):
+        """Test that no refresh is queued into a cache the web processes cannot read"""
+        user = User.objects.create_user(username=USERNAME, password=PASSWORD)
+        system = HydroponicSystem.objects.create(owner=user, name="Test System")
+        self.post_measurements(system)
+        self.assertFalse(Job.objects.exists())
+
+    def test_prune_finished_jobs(self):
+        """Test that finished jobs are deleted once past their retention"""
+        done, failed, recent = [enqueue("test_flaky", fail=False) for _ in range(3)]
+        run_batch("worker", batch_size=3)
+        Job.objects.filter(id=failed.id).update(status=Job.FAILED)
+        pending = enqueue("test_flaky", fail=False)
+        old = timezone.now() - timedelta(days=settings.JOB_RETENTION_DAYS + 1)
+        Job.objects.exclude(id=recent.id).update(updated_at=old)
+
+        with mock.patch("api.jobs.claim", return_value=[]):
+            call_command("run_jobs", "--once", stdout=StringIO())
+        self.assertQuerySetEqual(
+            Job.objects.order_by("id"), [recent, pending], ordered=True
+        )
+
+
+class IngestGatewayTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username=USERNAME, password=PASSWORD)
+        self.system = HydroponicSystem.objects.create(
+            owner=self.user, name="Test System"
+        )
+        other_user = User.objects.create_user(
+            username=OTHER_USERNAME, password=OTHER_PASSWORD
+        )
+        self.other_system = HydroponicSystem.objects.create(
+            owner=other_user, name="Other System"
+        )
+        self.token = str(AccessToken.for_user(self.user))
+
+    def line(self, system_id, ph=6.0, timestamp=""):
+        return f"hydroponics,system={system_id} ph={ph},temperature=22.5,tds=800i {timestamp}"
+
+    def test_parse_line(self):
+        """Test parsing a line-protocol reading with a nanosecond timestamp"""
+        measurement = parse_line(
+            self.line(self.system.id, timestamp=1739000000123456789)
+        )
+        self.assertEqual(measurement.system_id, self.system.id)
+        self.assertEqual(measurement.tds, 800.0)
+        self.assertEqual(measurement.measured_at, from_epoch_us(1739000000123456))
+
+    def test_parse_invalid_lines(self):
+        """Test that malformed readings are rejected"""
+        for line in (
+            "garbage",
+            "hydroponics ph=6.0,temperature=22.5,tds=800",  # No system
+            "hydroponics,system=1 ph=6.0,tds=800",  # No temperature
+            "hydroponics,system=1 ph=acid,temperature=22.5,tds=800",
+        ):
+            with self.assertRaises(LineProtocolError):
+                parse_line(line)
+
+    def test_bulk_ingest_validates_measurements(self):
+        """Test that bulk ingest runs model validation before inserting"""
+        created, rejected = SensorMeasurement.objects.bulk_ingest(
+            [
+                SensorMeasurement(system=self.system, ph=6.0, temperature=22, tds=800),
+                SensorMeasurement(system=self.system, ph=15.0, temperature=22, tds=800),
+            ]
+        )
+        self.assertEqual(len(created), 1)
+        self.assertIn("ph", rejected[0][1].message_dict)
+        self.assertEqual(SensorMeasurement.objects.count(), 1)
+
+    def test_bulk_ingest_rejects_non_finite_values(self):
+        """Test that NaN and infinite readings are rejected before the insert"""
+        created, rejected = SensorMeasurement.objects.bulk_ingest(
+            [
+                parse_line(
+                    "hydroponics,system={} ph=6.0,temperature={},tds=800".format(
+                        self.system.id, value
+                    )
+                )
+                for value in ("22.5", "inf", "nan", "-inf")
+            ]
+        )
+        self.assertEqual(len(created), 1)
+        self.assertEqual(len(rejected), 3)
+        self.assertTrue(
+            all("temperature" in error.message_dict for _, error in rejected)
+        )
+
+    def test_failed_batch_is_retried_row_by_row(self):
+        """Test that a row the database refuses does not drop the whole batch"""
+        bulk_ingest = SensorMeasurement.objects.bulk_ingest
+
+        def refuse_ph_7(measurements):
+            if any(measurement.ph == 7.0 for measurement in measurements):
+                raise IntegrityError("refused")
+            return bulk_ingest(measurements)
+
+        gateway = IngestGateway()
+        batch = [parse_line(self.line(self.system.id, ph=ph)) for ph in (6.0, 7.0, 6.5)]
+        with mock.patch.object(
+            SensorMeasurement.objects, "bulk_ingest", side_effect=refuse_ph_7
+        ):
+            async_to_sync(gateway.flush)(batch)
+        self.assertEqual(gateway.stats["written"], 2)
+        self.assertEqual(gateway.stats["failed"], 1)
+        self.assertEqual(
+            sorted(self.system.measurements.values_list("ph", flat=True)), [6.0, 6.5]
+        )
+
+    def test_tcp_ingest(self):
+        """Test authenticated TCP ingest with batching and per-line errors"""
+
+        async def scenario():
+            gateway = IngestGateway(batch_size=2, flush_interval=0.05)
+            await gateway.start("127.0.0.1", tcp_port=0)
+            port = gateway.servers[0].sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"AUTH {self.token}\n".encode())
+            greeting = await reader.readline()
+            lines = [
+                self.line(self.system.id, timestamp=1739000000000000000),
+                self.line(self.system.id, ph=6.5),
+                self.line(self.system.id, ph=15.0),  # Fails model validation
+                self.line(self.other_system.id),  # Not the user's system
+                "garbage",
+            ]
+            writer.write(("\n".join(lines) + "\n").encode())
+            await writer.drain()
+            errors = [await reader.readline(), await reader.readline()]
+            writer.close()
+            await asyncio.sleep(0.1)
+            await gateway.stop()
+            return greeting, errors, gateway.stats
+
+        greeting, errors, stats = async_to_sync(scenario)()
+        self.assertEqual(greeting, b"OK\n")
+        self.assertTrue(all(error.startswith(b"ERR") for error in errors))
+        self.assertEqual(stats["received"], 3)
+        self.assertEqual(stats["written"], 2)
+        self.assertEqual(stats["rejected"], 3)
+        self.assertEqual(self.system.measurements.count(), 2)
+        self.assertTrue(
+            self.system.measurements.filter(
+                measured_at=from_epoch_us(1739000000000000)
+            ).exists()
+        )  # Device timestamps are kept
+        self.assertFalse(self.other_system.measurements.exists())
+
+    def test_tcp_ingest_rejects_invalid_token(self):
+        """Test connecting with an invalid token (should fail)"""
+
+        async def scenario():
+            gateway = IngestGateway()
+            await gateway.start("127.0.0.1", tcp_port=0)
+            port = gateway.servers[0].sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"AUTH not-a-token\n")
+            response = await reader.readline()
+            writer.close()
+            await gateway.stop()
+            return response
+
+        self.assertTrue(async_to_sync(scenario)().startswith(b"ERR"))
+
+    def tcp_session(self, *lines, replies=0):
+        """Send `lines` over an authenticated connection; return the replies."""
+
+        async def scenario():
+            gateway = IngestGateway(flush_interval=0.05)
+            await gateway.start("127.0.0.1", tcp_port=0)
+            port = gateway.servers[0].sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"AUTH {self.token}\n".encode())
+            received = [await reader.readline()]
+            writer.write(("\n".join(lines) + "\n").encode())
+            await writer.drain()
+            for _ in range(replies):
+                received.append(await reader.readline())
+            writer.close()
+            await asyncio.sleep(0.1)
+            await gateway.stop()
+            return received
+
+        return async_to_sync(scenario)()
+
+    def test_tcp_ingest_checks_token_again(self):
+        """Test that a connection is closed once its token expired or its user left"""
+        check = mock.patch(
+            "api.ingest.authenticate",
+            side_effect=[
+                ({self.system.id}, time.time()),  # Expires right away
+                PermissionError("Invalid or expired token."),
+            ],
+        )
+        with check:
+            replies = self.tcp_session(
+                self.line(self.system.id), self.line(self.system.id), replies=2
+            )
+        self.assertEqual(replies[0], b"OK\n")
+        self.assertTrue(replies[1].startswith(b"ERR"))
+        self.assertEqual(replies[2], b"")  # Closed by the gateway
+        self.assertFalse(self.system.measurements.exists())
+
+    def test_tcp_ingest_rejects_inactive_user(self):
+        """Test that tokens of deactivated users are refused"""
+        User.objects.filter(id=self.user.id).update(is_active=False)
+        with self.assertRaises(PermissionError):
+            authenticate(self.token)
+
+    def test_tcp_ingest_survives_long_lines(self):
+        """Test that a line above the stream limit is rejected, not fatal"""
+        replies = self.tcp_session(
+            "x" * 100_000, self.line(self.system.id, ph=6.5), replies=1
+        )
+        self.assertTrue(replies[1].startswith(b"ERR"))
+        self.assertEqual(
+            list(self.system.measurements.values_list("ph", flat=True)), [6.5]
+        )
+
+    def test_udp_ingest(self):
+        """Test ingesting a datagram carrying its own credentials"""
+
+        async def scenario():
+            gateway = IngestGateway(flush_interval=0.05)
+            await gateway.start("127.0.0.1", udp_port=0)
+            address = gateway.transports[0].get_extra_info("sockname")
+            sender, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+                asyncio.DatagramProtocol, remote_addr=address
+            )
+            sender.sendto(f"AUTH {self.token}\n{self.line(self.system.id)}\n".encode())
+            for _ in range(50):
+                if gateway.stats["received"]:
+                    break
+                await asyncio.sleep(0.01)
+            sender.close()
+            await gateway.stop()
+
+        async_to_sync(scenario)()
+        self.assertEqual(self.system.measurements.count(), 1)
+
+
+class BinaryResponseTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username=USERNAME, password=PASSWORD)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.system = HydroponicSystem.objects.create(
+            owner=self.user, name="Test System"
+        )
+        self.start = timezone.now().replace(microsecond=0) - timedelta(hours=10)
+        SensorMeasurement.objects.bulk_create(
+            SensorMeasurement(
+                system=self.system,
+                ph=6.0 + i / 10,
+                temperature=20.0 + i,
+                tds=500 + i,
+                measured_at=self.start + timedelta(hours=i),
+            )
+            for i in range(5)
+        )
+
+    def get_msgpack(self, url, data=None):
+        response = self.client.get(url, data, HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        return msgpack.unpackb(response.content, timestamp=3)
+
+    def column(self, data, name):
+        return np.frombuffer(data[name], dtype=data["dtypes"][name]).tolist()
+
+    def test_history_as_packed_columns(self):
+        """Test that MessagePack clients get the history as typed arrays"""
+        data = self.get_msgpack(f"{BASE_URL}/api/systems/{self.system.id}/history/")
+        self.assertEqual(data["count"], 5)
+        self.assertEqual(data["dtypes"]["measured_at"], "<i8")
+        self.assertEqual(data["dtypes"]["ph"], "<f8")
+        self.assertEqual(
+            self.column(data, "measured_at"),
+            [to_epoch_us(self.start + timedelta(hours=i)) for i in range(5)],
+        )
+        self.assertEqual(self.column(data, "ph"), [6.0, 6.1, 6.2, 6.3, 6.4])
+
+    def test_measurement_list_as_packed_columns(self):
+        """Test that filtered measurement pages are packed column by column"""
+        data = self.get_msgpack(
+            f"{BASE_URL}/api/measurements/",
+            {"tds__gte": 502, "ordering": "measured_at"},
+        )
+        self.assertEqual(data["count"], 3)
+        results = data["results"]
+        self.assertEqual(self.column(results, "tds"), [502.0, 503.0, 504.0])
+        self.assertEqual(self.column(results, "system"), [self.system.id] * 3)
+        self.assertEqual(
+            self.column(results, "measured_at")[0],
+            to_epoch_us(self.start + timedelta(hours=2)),
+        )
+
+    def test_format_query_parameter(self):
+        """Test selecting MessagePack with `?format=msgpack`"""
+        response = self.client.get(
+            f"{BASE_URL}/api/systems/{self.system.id}/analytics/?format=msgpack"
+        )
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        data = msgpack.unpackb(response.content, timestamp=3)
+        self.assertEqual(data["count"], 5)
+        self.assertIsNone(data["start"])
+
+    def test_json_is_still_the_default(self):
+        """Test that clients without an Accept header still get JSON"""
+        response = self.client.get(f"{BASE_URL}/api/measurements/")
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(response.data["count"], 5)
+
+    def test_gzip_compression(self):
+        """Test that large responses are gzipped for clients that accept it"""
+        response = self.client.get(
+            f"{BASE_URL}/api/measurements/", HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(response.content))["count"], 5)
+
+    def test_brotli_compression(self):
+        """Test that Brotli is preferred when the client accepts it"""
+        response = self.client.get(
+            f"{BASE_URL}/api/measurements/", HTTP_ACCEPT_ENCODING="gzip, deflate, br"
+        )
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(json.loads(brotli.decompress(response.content))["count"], 5)
+
+
+class StartupTests(SimpleTestCase):
+    # Production environment: debug tooling, admin and API docs left out
+    PRODUCTION_ENV = {"DEBUG": "False", "ENABLE_ADMIN": "", "ENABLE_API_DOCS": ""}
+
+    def import_times(self, **env):
+        """Import the WSGI application in a new interpreter; return {module: µs}."""
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import HydroponicsSystem.wsgi"],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, **env},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        times = {}
+        for line in result.stderr.splitlines():
+            if line.startswith("import time:"):
+                self_us, _, module = line.removeprefix("import time:").split("|")
+                if self_us.strip().isdigit():
+                    times[module.strip()] = int(self_us)
+        return times
+
+    @skipIf(not IMPORT_TIME_BUDGET_MS, "IMPORT_TIME_BUDGET_MS is 0")
+    @skipIf(
+        sys.gettrace() is not None or "coverage" in sys.modules,
+        "Import times are meaningless under a tracer or coverage",
+    )
+    def test_cold_start_budget(self):
+        """Test that importing the application stays within the start-up budget"""
+        total_ms = statistics.median(
+            sum(self.import_times(**self.PRODUCTION_ENV).values()) / 1000
+            for _ in range(IMPORT_TIME_SAMPLES)
+        )
+        self.assertLess(total_ms, IMPORT_TIME_BUDGET_MS)
+
+    def test_production_does_not_import_optional_surfaces(self):
+        """Test that DEBUG=False keeps debug tooling and API docs out"""
+        modules = self.import_times(**self.PRODUCTION_ENV)
+        self.assertIn("api.views", modules)  # The URLconf is imported up front
+        self.assertNotIn("debug_toolbar", modules)
+        self.assertNotIn("drf_yasg", modules)
+
+    def test_env_bool(self):
+        """Test that boolean settings are parsed instead of checked for truthiness"""
+        for value, expected in (("False", False), ("0", False), ("true", True)):
+            with mock.patch.dict(os.environ, {"FLAG": value}):
+                self.assertIs(env_bool("FLAG"), expected)
+        with mock.patch.dict(os.environ, {"FLAG": ""}):
+            self.assertIs(env_bool("FLAG", True), True)
+
+
+class SchemaTests(TestCase):
+    def test_schema_is_generated_once(self):
+        """Test that the OpenAPI schema is generated on the first request only"""
+        user = User.objects.create_user(username=USERNAME, password=PASSWORD)
+        view = SchemaView.without_ui()
+        SchemaView._schemas.clear()
+        get_schema = OpenAPISchemaGenerator.get_schema
+        with mock.patch.object(
+            OpenAPISchemaGenerator, "get_schema", autospec=True, side_effect=get_schema
+        ) as generated:
+            for _ in range(3):
+                request = APIRequestFactory().get("/api/docs/", {"format": "openapi"})
+                force_authenticate(request, user=user)
+                response = view(request)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertIn("/measurements/", response.data["paths"])
+        self.assertEqual(generated.call_count, 1)
+
+
+class MeasurementOwnerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username=USERNAME, password=PASSWORD)
+        self.other_user = User.objects.create_user(
+            username=OTHER_USERNAME, password=OTHER_PASSWORD
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.system = HydroponicSystem.objects.create(
+            owner=self.user, name="Test System"
+        )
+
+    def test_owner_is_set_on_create(self):
+        """Test that measurements submitted through the API copy the system owner"""
+        response = self.client.post(
+            f"{BASE_URL}/api/measurements/",
+            {"system": self.system.id, "ph": 6.5, "temperature": 22.0, "tds": 500},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        measurement = SensorMeasurement.objects.get(id=response.data["id"])
+        self.assertEqual(measurement.owner_id, self.user.id)
+
+    def test_owner_is_set_on_bulk_insert(self):
+        """Test that bulk inserts fill in the owner from each system"""
+        other_system = HydroponicSystem.objects.create(
+            owner=self.other_user, name="Other System"
+        )
+        created, _ = SensorMeasurement.objects.bulk_ingest(
+            SensorMeasurement(system_id=system.id, ph=6.5, temperature=22, tds=500)
+            for system in (self.system, other_system)
+        )
+        self.assertEqual(
+            [measurement.owner_id for measurement in created],
+            [self.user.id, self.other_user.id],
+        )
+
+    def test_measurement_without_owner_is_refused(self):
+        """Test that inserts bypassing the manager cannot leave the owner empty"""
+        with self.assertRaises(IntegrityError):
+            SensorMeasurement.objects.all().bulk_create(
+                [SensorMeasurement(system=self.system, ph=6.5, temperature=22, tds=500)]
+            )
+
+    def test_owner_follows_system_transfer(self):
+        """Test that transferring a system moves its measurements to the new owner"""
+        SensorMeasurement.objects.create(
+            system=self.system, ph=6.5, temperature=22.0, tds=500
+        )
+        self.system.owner = self.other_user
+        self.system.save()
+        self.assertEqual(SensorMeasurement.objects.get().owner_id, self.other_user.id)
+
+        self.client.force_authenticate(user=self.other_user)
+        response = self.client.get(f"{BASE_URL}/api/measurements/")
+        self.assertEqual(response.data["count"], 1)
+
+    def test_saving_system_without_transfer_leaves_measurements(self):
+        """Test that other system updates do not rewrite the measurements"""
+        with CaptureQueriesContext(connection) as queries:
+            self.system.name = "Renamed"
+            self.system.save()
+            self.system.save(update_fields=["deleted_at"])
+        self.assertFalse(
+            any("api_sensormeasurement" in query["sql"] for query in queries)
+        )
+
+    def test_listing_uses_owner_index(self):
+        """Test that owner-wide listings read the (owner, measured_at) index without a join"""
+        SensorMeasurement.objects.create(
+            system=self.system, ph=6.5, temperature=22.0, tds=500
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"{BASE_URL}/api/measurements/")
+        self.assertEqual(response.data["count"], 1)
+        listing = [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith('SELECT "api_sensormeasurement"."id"')
+        ]
+        self.assertTrue(listing)
+        self.assertNotIn("JOIN", listing[0])
+
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:  # Tiny tables favour sequential scans
+                cursor.execute("SET enable_seqscan = off")
+        queryset = SensorMeasurement.objects.filter(owner=self.user).order_by(
+            "-measured_at"
+        )
+        self.assertIn("measurement_owner_time_idx", queryset.explain())
+
+    def test_listing_hides_deleted_systems(self):
+        """Test that measurements of deleted systems leave the owner-wide listing"""
+        SensorMeasurement.objects.create(
+            system=self.system, ph=6.5, temperature=22.0, tds=500
+        )
+        self.client.delete(f"{BASE_URL}/api/systems/{self.system.id}/")
+        response = self.client.get(f"{BASE_URL}/api/measurements/")
+        self.assertEqual(response.data["count"], 0)
+
+
+class OwnerMigrationTests(TransactionTestCase):
+    def migrate(self, target=None):
+        """Migrate to `target`, or to the latest migrations; return its apps."""
+        executor = MigrationExecutor(connection)
+        targets = [target] if target else executor.loader.graph.leaf_nodes()
+        executor.migrate(targets)
+        executor.loader.build_graph()
+        return executor.loader.project_state(targets).apps
+
+    def test_backfill_migration(self):
+        """Test that the migration copies owners onto existing measurements in batches"""
+        self.addCleanup(self.migrate)
+        old_apps = self.migrate(("api", "0006_measurement_device_time"))
+        user = old_apps.get_model("auth", "User").objects.create(username=USERNAME)
+        system = old_apps.get_model("api", "HydroponicSystem").objects.create(
+            owner_id=user.id, name="Test System"
+        )
+        old_apps.get_model("api", "SensorMeasurement").objects.bulk_create(
+            old_apps.get_model("api", "SensorMeasurement")(
+                system_id=system.id, ph=6.5, temperature=22.0, tds=500
+            )
+            for _ in range(5)
+        )
+
+        with mock.patch.object(
+            import_module("api.migrations.0007_measurement_owner"),
+            "BACKFILL_BATCH_SIZE",
+            2,
+        ):
+            self.migrate(("api", "0007_measurement_owner"))
+        self.assertEqual(
+            list(SensorMeasurement.objects.values_list("owner_id", flat=True)),
+            [user.id] * 5,
+        )
+
+    def test_owner_index_built_concurrently_on_postgresql(self):
+        """Test that PostgreSQL swaps the indexes without blocking writes"""
+        migration = import_module("api.migrations.0007_measurement_owner")
+        schema_editor = mock.Mock()
+        schema_editor.connection.vendor = "postgresql"
+        migration.replace_time_index(django_apps, schema_editor)
+        schema_editor.add_index.assert_called_once_with(
+            SensorMeasurement, migration.OWNER_TIME_INDEX, concurrently=True
+        )
+        schema_editor.remove_index.assert_called_once_with(
+            SensorMeasurement, migration.TIME_INDEX, concurrently=True
+        )
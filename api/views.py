@@ -1,16 +1,38 @@
+from datetime import timezone as dt_timezone
+import numpy as np
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics, permissions, viewsets, filters
+from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.exceptions import PermissionDenied
 from rest_framework_simplejwt.tokens import RefreshToken
+from .analytics import invalidate_system_analytics, system_analytics
+from .archive import METRICS, Series, from_epoch_us, read_history, to_epoch_us
+from .db_routers import (
+    has_recent_write,
+    mark_recent_write,
+    start_replica_reads,
+    stop_replica_reads,
+)
+from .filters import SensorMeasurementFilter
+from .fleet import fleet_summary
+from .jobs import enqueue
 from .models import HydroponicSystem, SensorMeasurement
+from .renderers import MessagePackRenderer, columns
 from .serializers import (
     HydroponicSystemSerializer,
     SensorMeasurementSerializer,
     RegisterSerializer,
 )
+from .tasks import measurements_added
 from rest_framework.exceptions import ValidationError as DRFValidationError
 from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework.response import Response
@@ -29,14 +51,90 @@ class StandardResultsSetPagination(PageNumberPagination):
     max_page_size = 100
 
 
-class HydroponicSystemViewSet(viewsets.ModelViewSet):
+def parse_datetime_param(request, name):
+    """Parse an optional ISO 8601 query parameter; naive values are taken as UTC."""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise DRFValidationError({name: "Enter a valid ISO 8601 date/time."})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def parse_limit_param(request, maximum):
+    """Parse the optional `limit` query parameter, between 1 and `maximum`."""
+    value = request.query_params.get("limit")
+    if not value:
+        return maximum
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= maximum:
+        raise DRFValidationError(
+            {"limit": f"Enter a whole number between 1 and {maximum}."}
+        )
+    return limit
+
+
+class ReplicaReadMixin:
+    """
+    Serve heavy read-only actions from a read replica.
+
+    - Actions listed in `replica_actions` read from a replica (when configured)
+    - Successful writes pin the client to the primary for a short window,
+      so it always reads its own writes
+    - Without replicas neither step touches the cache
+    """
+
+    replica_actions = ("list",)
+
+    def dispatch(self, request, *args, **kwargs):
+        """Always stop replica reads, even when the view raises an unhandled error."""
+        self._replica_token = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self._replica_token is not None:
+                stop_replica_reads(self._replica_token)
+                self._replica_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Decided here, once the user is authenticated and the action known
+        if (
+            settings.DATABASE_REPLICAS
+            and self.action in self.replica_actions
+            and not has_recent_write(request.user)
+        ):
+            self._replica_token = start_replica_reads()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if (
+            settings.DATABASE_REPLICAS
+            and response.status_code < 400
+            and request.method not in permissions.SAFE_METHODS
+        ):
+            mark_recent_write(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class HydroponicSystemViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing hydroponic systems.
 
     - Supports CRUD operations (Create, Read, Update, Delete)
+    - Deletes systems in the background, so large histories do not time out
     - Restricts access to authenticated users
     - Ensures users can only access their own hydroponic systems
     - Provides ordering by name and creation date
+    - Exposes the full (live and archived) measurement history in column form
+    - Provides cached per-system analytics over that history
+    - Summarises the whole fleet in a constant number of queries
+    - Renders MessagePack on request, with the history as packed columns
     """
 
     queryset = (
@@ -46,7 +144,9 @@ class HydroponicSystemViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = StandardResultsSetPagination
     filter_backends = [filters.OrderingFilter]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, MessagePackRenderer]
     ordering_fields = ["name", "created_at"]
+    replica_actions = ("list", "history", "analytics", "fleet")
 
     def get_queryset(self):
         """
@@ -69,6 +169,18 @@ class HydroponicSystemViewSet(viewsets.ModelViewSet):
         """Ensure that the hydroponic system is associated with the logged-in user."""
         serializer.save(owner=self.request.user)
 
+    def perform_destroy(self, instance):
+        """
+        Hide the system immediately and purge its measurements in the background.
+
+        Deleting a long history inside the request would take time proportional
+        to its size, so the `purge_system` job removes it in batches instead.
+        """
+        with transaction.atomic():
+            instance.deleted_at = timezone.now()
+            instance.save(update_fields=["deleted_at"])
+            enqueue("purge_system", system_id=instance.id)
+
     def get_object(self):
         """Retrieve object without filtering by user, then check permissions."""
         obj = get_object_or_404(
@@ -89,15 +201,94 @@ class HydroponicSystemViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
+    @action(detail=False, methods=["get"])
+    def fleet(self, request):
+        """
+        Return the latest reading and 24h min/max/mean and out-of-band counts
+        for every system of the user, one page at a time.
+        """
+        systems = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        return self.get_paginated_response(fleet_summary(systems))
+
+    @action(detail=True, methods=["get"])
+    def history(self, request, pk=None):
+        """
+        Return the system's measurements between `start` and `end` in column form.
+
+        Archived ranges are read from the columnar archive files and merged
+        with the measurements still stored in the database. MessagePack
+        clients receive the arrays as packed columns.
+
+        Results are paged: at most `limit` measurements (`HISTORY_PAGE_SIZE`
+        by default and at most) are returned and `next` links to the
+        following page. Readings sharing a timestamp are never split.
+        """
+        system = self.get_object()
+        limit = parse_limit_param(request, settings.HISTORY_PAGE_SIZE)
+        series = read_history(
+            system,
+            start=parse_datetime_param(request, "start"),
+            end=parse_datetime_param(request, "end"),
+            limit=limit + 1,
+        )
+
+        next_url = None
+        if len(series.measured_at) > limit:
+            next_start = int(series.measured_at[limit])
+            # End the page before the first reading sharing the next page's
+            # start time, so pages neither repeat nor skip readings
+            cut = int(np.searchsorted(series.measured_at, next_start))
+            if cut:
+                series = Series(*(column[:cut] for column in series))
+            else:  # More than a page within one microsecond: return them all
+                series = read_history(
+                    system,
+                    start=from_epoch_us(next_start),
+                    end=from_epoch_us(next_start + 1),
+                )
+                next_start += 1
+            next_url = replace_query_param(
+                request.build_absolute_uri(),
+                "start",
+                from_epoch_us(next_start).isoformat(),
+            )
+
+        data = {"system": system.id, "count": len(series.measured_at), "next": next_url}
+        if request.accepted_renderer.format == MessagePackRenderer.format:
+            data.update(columns(**series._asdict()))
+            return Response(data)
+
+        data["measured_at"] = [
+            from_epoch_us(value) for value in series.measured_at.tolist()
+        ]
+        for metric in METRICS:
+            data[metric] = getattr(series, metric).tolist()
+        return Response(data)
+
+    @action(detail=True, methods=["get"])
+    def analytics(self, request, pk=None):
+        """
+        Return pH/temperature correlation, TDS drift per day and the average
+        diurnal temperature curve for measurements between `start` and `end`.
+        """
+        system = self.get_object()
+        start = parse_datetime_param(request, "start")
+        end = parse_datetime_param(request, "end")
+        data = {"system": system.id, "start": start, "end": end}
+        data.update(system_analytics(system, start, end))
+        return Response(data)
+
 
-class SensorMeasurementViewSet(viewsets.ModelViewSet):
+class SensorMeasurementViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing sensor measurements.
 
     - Supports CRUD operations
     - Restricts access to authenticated users
-    - Filters by pH, temperature, TDS, and measurement date
+    - Filters by pH, temperature, TDS, and measurement date (exact and ranges)
+    - Filters readings outside the configured bands
     - Provides ordering by measurement date
+    - Renders MessagePack on request, with list pages as packed columns
     """
 
     queryset = (
@@ -107,7 +298,8 @@ class SensorMeasurementViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = StandardResultsSetPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
-    filterset_fields = ["ph", "temperature", "tds", "measured_at"]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, MessagePackRenderer]
+    filterset_class = SensorMeasurementFilter
     ordering_fields = ["measured_at"]
 
     def get_queryset(self):
@@ -116,6 +308,7 @@ class SensorMeasurementViewSet(viewsets.ModelViewSet):
 
         - If `system_id` is provided, returns measurements for that system.
         - If no `system_id` is provided, returns all measurements from user's systems.
+        - Leaves out measurements of systems deleted but not purged yet.
         - Returns an empty queryset if the request is from Swagger UI (`swagger_fake_view`).
         - Prevents errors when an AnonymousUser tries to access the data.
         """
@@ -127,9 +320,16 @@ class SensorMeasurementViewSet(viewsets.ModelViewSet):
 
         system_id = self.request.query_params.get("system_id")
         if not system_id:
-            return SensorMeasurement.objects.filter(
-                system__owner=self.request.user
-            ).order_by("-measured_at")
+            # Uses the denormalized owner, so pages are read straight from the
+            # (owner, measured_at) index without joining the systems
+            deleted_systems = HydroponicSystem.all_objects.filter(
+                owner=self.request.user, deleted_at__isnull=False
+            )
+            return (
+                SensorMeasurement.objects.filter(owner=self.request.user)
+                .exclude(system__in=deleted_systems.values("id"))
+                .order_by("-measured_at")
+            )
 
         hydro_system = get_object_or_404(
             HydroponicSystem, id=system_id, owner=self.request.user
@@ -138,9 +338,34 @@ class SensorMeasurementViewSet(viewsets.ModelViewSet):
             "-measured_at"
         )
 
+    def list(self, request, *args, **kwargs):
+        """List measurements; MessagePack clients get each page as packed columns."""
+        if request.accepted_renderer.format != MessagePackRenderer.format:
+            return super().list(request, *args, **kwargs)
+
+        rows = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset()).values_list(
+                "id", "system_id", "measured_at", *METRICS
+            )
+        )
+        values = np.array([row[3:] for row in rows], dtype=np.float64)
+        values = values.reshape(-1, len(METRICS))
+        return self.get_paginated_response(
+            columns(
+                id=np.array([row[0] for row in rows], dtype=np.int64),
+                system=np.array([row[1] for row in rows], dtype=np.int64),
+                measured_at=np.array(
+                    [to_epoch_us(row[2]) for row in rows], dtype=np.int64
+                ),
+                **{metric: values[:, i] for i, metric in enumerate(METRICS)},
+            )
+        )
+
     def get_object(self):
         """Ensure users can only access or delete their own measurements."""
-        obj = get_object_or_404(SensorMeasurement, id=self.kwargs["pk"])
+        obj = get_object_or_404(
+            SensorMeasurement, id=self.kwargs["pk"], system__deleted_at__isnull=True
+        )
 
         if obj.system.owner != self.request.user:  # Check ownership
             raise PermissionDenied(
@@ -150,12 +375,35 @@ class SensorMeasurementViewSet(viewsets.ModelViewSet):
         return obj  # Unauthorized users get 403
 
     def perform_create(self, serializer):
-        """Ensure that pH validation errors result in 400 Bad Request instead of a server error."""
+        """
+        Ensure that pH validation errors result in 400 Bad Request instead of a server error.
+
+        Downstream processing (analytics refresh) is queued as background jobs.
+        """
         try:
             instance = serializer.save()
-            instance.full_clean()
         except DjangoValidationError as e:
             raise DRFValidationError(e.message_dict)
+        measurements_added([instance.system_id])
+
+    def perform_update(self, serializer):
+        """
+        Report validation errors as 400 Bad Request, like `perform_create`.
+
+        The cached analytics of the systems the reading belonged to are invalidated.
+        """
+        system_id = serializer.instance.system_id
+        try:
+            instance = serializer.save()
+        except DjangoValidationError as e:
+            raise DRFValidationError(e.message_dict)
+        for changed_id in {system_id, instance.system_id}:
+            invalidate_system_analytics(changed_id)
+
+    def perform_destroy(self, instance):
+        """Invalidate the cached analytics of the reading's system."""
+        instance.delete()
+        invalidate_system_analytics(instance.system_id)
 
 
 class RegisterView(generics.CreateAPIView):
@@ -0,0 +1,62 @@
+"""
+Gunicorn configuration for HydroponicsSystem.
+
+Gunicorn loads this file automatically from the working directory. Every
+setting can be overridden through environment variables so the same image
+can be tuned per deployment:
+
+- GUNICORN_PROFILE: base profile, "sync" or "threaded" (default)
+- GUNICORN_WORKER_CLASS: overrides the worker class of the selected profile
+- GUNICORN_WORKERS: number of worker processes (default: 2 * cores + 1)
+- GUNICORN_THREADS: threads per worker (only used by threaded workers)
+- GUNICORN_PRELOAD: import the application once in the master before forking
+- GUNICORN_MAX_REQUESTS / GUNICORN_MAX_REQUESTS_JITTER: recycle workers
+- GUNICORN_TIMEOUT / GUNICORN_KEEPALIVE: worker and keep-alive timeouts
+"""
+
+import multiprocessing
+import os
+
+from HydroponicsSystem.settings import env_bool
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+CORES = multiprocessing.cpu_count()
+
+# Base profiles. "threaded" suits the mostly I/O bound API (database round
+# trips), "sync" is the gunicorn default.
+PROFILES = {
+    "sync": {"worker_class": "sync", "workers": CORES * 2 + 1, "threads": 1},
+    "threaded": {"worker_class": "gthread", "workers": CORES + 1, "threads": 4},
+}
+
+profile_name = os.getenv("GUNICORN_PROFILE", "threaded")
+if profile_name not in PROFILES:
+    raise ValueError(
+        f"Unknown GUNICORN_PROFILE {profile_name!r}; "
+        f"choose one of: {', '.join(PROFILES)}."
+    )
+profile = PROFILES[profile_name]
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", profile["worker_class"])
+workers = _env_int("GUNICORN_WORKERS", profile["workers"])
+threads = _env_int("GUNICORN_THREADS", profile["threads"])
+preload_app = env_bool("GUNICORN_PRELOAD", True)
+max_requests = _env_int("GUNICORN_MAX_REQUESTS", 1000)
+max_requests_jitter = _env_int("GUNICORN_MAX_REQUESTS_JITTER", 100)
+timeout = _env_int("GUNICORN_TIMEOUT", 30)
+keepalive = _env_int("GUNICORN_KEEPALIVE", 5)
+accesslog = os.getenv("GUNICORN_ACCESSLOG", "-") or None
+
+
+def pre_fork(server, worker):
+    """Never hand a database connection opened in the master to a worker."""
+    if preload_app:
+        from django.db import connections
+
+        connections.close_all()
@@ -0,0 +1,91 @@
+"""
+HTTP throughput benchmark for the Hydroponics API.
+
+Runs a fixed number of concurrent clients against one endpoint for a fixed
+duration and reports requests/sec and latency percentiles. Run it once
+against the old deployment and once against the tuned one to compare, both
+backed by PostgreSQL (connection settings have no effect on SQLite), e.g.:
+
+    python scripts/benchmark.py --url http://localhost:8000 \
+        --username demo --password secret --path /api/measurements/ \
+        --concurrency 32 --duration 30
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def obtain_token(base_url, username, password):
+    """Log in once and return a JWT access token."""
+    response = requests.post(
+        f"{base_url}/api/token/",
+        data={"username": username, "password": password},
+        timeout=10,
+    )
+    response.raise_for_status()
+    return response.json()["access"]
+
+
+def run_client(url, headers, deadline, latencies, errors, lock):
+    """Issue requests on a keep-alive session until the deadline passes."""
+    session = requests.Session()
+    session.headers.update(headers)
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            ok = session.get(url, timeout=30).status_code < 400
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors.append(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--path", default="/api/measurements/")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0)
+    args = parser.parse_args()
+
+    token = obtain_token(args.url, args.username, args.password)
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies, errors, lock = [], [], threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for _ in range(args.concurrency):
+            pool.submit(
+                run_client,
+                f"{args.url}{args.path}",
+                headers,
+                deadline,
+                latencies,
+                errors,
+                lock,
+            )
+
+    total = len(latencies) + len(errors)
+    print(f"requests:     {total} ({len(errors)} failed)")
+    print(f"requests/sec: {total / args.duration:.1f}")
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100)
+        print(
+            f"latency ms:   p50={cuts[49] * 1000:.1f} "
+            f"p95={cuts[94] * 1000:.1f} p99={cuts[98] * 1000:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()